@@ -1,7 +1,7 @@
 __version__ = '0.0'
 
 from .generate import Generate
-from .symbolic import Variable, Parameter, Constant
+from .symbolic import Variable, Parameter, Constant, SymbolRegistry
 from .problem  import Minimize, Problem
 from .canonicalize import Canonicalize
 
@@ -16,4 +16,5 @@ from .operations.functions.scalars import abs
 from .constraints import eq, ge, le
 
 from .utilities import reshape
-from .solution import solve
+from .solution import solve, solve_batch, Solver
+from .report import StageReport
@@ -1,8 +1,10 @@
 
 from cvx_sym.operations.functions import Function, VectorFunction
 from cvx_sym.conventions import index_string
-from cvx_sym.operations.atoms import Atom
+from cvx_sym.operations.atoms import Atom, sums
 from cvx_sym.utilities import list_pprint
+from cvx_sym.mapping import ParameterMapping, normalize, polynomial, from_terms
+from cvx_sym.report import StageReport, unmeasured
 from cvx_sym.problem import Problem
 from cvx_sym import symbolic as sym
 from cvx_sym import sparse
@@ -24,10 +26,16 @@ class Canonicalize(Problem):
                 : Convention: (Ax == b) and (Gx <= h) matrices
     """
 
-    def __init__(self, problem, verbose = False, only = ''):
+    def __init__(self, problem, verbose = False, only = '', presolve = True,
+                                ordering = None, report = None):
 
-        self.problem = problem
-        self.verbose = verbose
+        self.problem  = problem
+        self.verbose  = verbose
+        self.presolve = presolve
+        self.ordering = ordering  # None, 'rcm' or 'min_degree'
+
+        # Time, memory and counts of each stage, see measure()
+        self.report = StageReport() if report is True else report
 
         if self.verbose:
             print(self.problem)
@@ -36,30 +44,89 @@ class Canonicalize(Problem):
         #self.gather_symbols()
         #self.original_vars = copy.deepcopy(self.vars)
 
+        self.mapping = None  # compiled parameter mapping, see compile()
+        self.data    = None  # numeric data, see assign_values()
+
         self.constraints = []
-        self.smith_form()
+        self.auxiliaries = {}  # structure of an expression : its aux, see smith
+
+        # Symbols of the problem, which the auxiliary variables also join
+        self.registry = problem.registry
+
+        with self.registry:
+            self.stages(only)
+
+    def stages(self, only = ''):
+        """ Run the stages of canonicalization, up to the one named only """
+
+        with self.measure('smith_form'):
+            self.smith_form()
         if (only == 'smith'): return
 
-        self.relax_form()
+        with self.measure('relax_form'):
+            self.relax_form()
         if (only == 'relax'): return
 
-        self.graph_form()
+        with self.measure('graph_form'):
+            self.graph_form()
         if (only == 'graph'): return
 
         self.canon_form()
 
+    def measure(self, stage):
+        """ Context in which stage is measured into self.report, if any """
+
+        if self.report is None:
+            return unmeasured()
+
+        return self.report.stage(stage, counts = self.counts)
+
+    def counts(self):
+        """ Counts of the objects making up the problem, as it is now """
+
+        counts = {'symbols' : len(self.registry),
+                  'constraints' : len(self.constraints)}
+
+        if hasattr(self, 'vars'):
+            counts['variables'] = len(self.vars)
+
+        if hasattr(self, 'G'):
+
+            counts['rows'] = len(self.h) + len(self.b or [])
+            counts['nonzeros'] = 0
+
+            for matrix in [self.A, self.G]:
+                if type(matrix) is dict:
+                    counts['nonzeros'] += len(matrix['val'])
+                elif matrix is not None:
+                    counts['nonzeros'] += len(matrix.A)
+
+        return counts
+
     def gather_symbols(self):
-        """ Rebuild self.vars, and self.parms """
+        """ Rebuild self.vars, and self.parms, from the registry of the
+            problem """
+
+        self.vars, self.parms, self.variables = {}, {}, {}
 
         # All rise to praise the holy python gods for enabling argument order
         # preservation in Python3.6+ dictionaries.
-        self.vars = { n:s for n, s in sym.symbols.items()
-                        if ((type(s) in [sym.Variable, sym.Symbol]) and
-                            s.matrix['val'] == [])  # hide parent symbols
-                    }
+        for n, s in self.registry.items():
+
+            kind = type(s)
+
+            if kind is sym.Parameter:
+                self.parms[n] = s
+
+            elif kind in [sym.Variable, sym.Symbol]:
+
+                if s.matrix['val'] == []:  # hide parent symbols
+                    self.vars[n] = s
 
-        self.parms = { n:s for n, s in sym.symbols.items()
-                        if (type(s) is sym.Parameter) }
+                # Variables as the user made them (not their elements), so
+                # that solutions can be mapped back onto their names and shapes
+                if kind is sym.Variable and s.index is None:
+                    self.variables[n] = s
 
     def smith(self, input, with_aux = 0, debug=0):
         """
@@ -76,7 +143,13 @@ class Canonicalize(Problem):
 
         elif issubclass(type(input), sym.Vector):
             if debug == 2: print('... Vector', input)
+            aux = self.shared(input)
+            if aux is not None:
+                return aux
+
             aux = sym.Symbol(input.shape)
+            self.share(input, aux)
+
             self.constraints += eq(aux, input).expand()
             # expand the constraint to ensure any scalar functions are
             #   applied elementwise from the beginning
@@ -95,10 +168,17 @@ class Canonicalize(Problem):
 
                     if debug == 2: print('... ... With Func/Atom/Sym Arg')
 
+                    aux = self.shared(input)
+                    if aux is not None:
+                        return aux
+
                     aux = sym.Symbol(input.shape)
+                    self.share(input, aux)
+
                     new = self.smith(arg, with_aux=1, debug=debug)
 
                     input.args[n] = new
+                    self.share(input, aux)  # also as it is now
                     self.constraints += [ eq(aux, input) ]
 
                     return aux
@@ -108,10 +188,17 @@ class Canonicalize(Problem):
 
                     if debug == 2: print('... ... With Vector Arg')
 
+                    aux = self.shared(input)
+                    if aux is not None:
+                        return aux
+
                     aux = sym.Symbol(input.shape)
+                    self.share(input, aux)
+
                     new = self.smith(arg, with_aux=1, debug=debug)
 
                     input.args[n] = new
+                    self.share(input, aux)  # also as it is now
                     self.constraints += [ eq(aux, input) ]
 
                     return aux
@@ -132,7 +219,12 @@ class Canonicalize(Problem):
 
             if with_aux:
                 # will replace this atom in above expressions
+                aux = self.shared(input)
+                if aux is not None:
+                    return aux
+
                 aux = sym.Symbol(input.shape)
+                self.share(input, aux)
                 self.constraints += [ eq(aux, input) ]
                 return aux
             else:
@@ -150,6 +242,65 @@ class Canonicalize(Problem):
             if debug == 2: print('...', type(input))
             return input
 
+    def structure(self, expr):
+        """
+            Hashable key of the structure of an expression tree, the same for
+            expressions which apply the same functions and atoms to the same
+            symbols and constants. Symbols are matched by identity.
+            None if the tree holds anything else
+        """
+
+        if issubclass(type(expr), sym.Symbol):
+            return id(expr)
+
+        elif type(expr) is sym.Constant:
+            return ('Constant', expr.value)
+
+        elif type(expr) in [int, float]:
+            return ('Constant', float(expr))
+
+        elif type(expr) in [list, tuple]:
+            args = expr
+            kind = ()
+
+        elif issubclass(type(expr), sym.Vector):
+            args = expr.args
+            kind = ('Vector', expr.shape, expr.trans)
+
+        elif issubclass(type(expr), (Function, Atom)):
+            args = expr.args
+            kind = (type(expr), expr.shape)
+
+        else:
+            return None
+
+        keys = tuple(self.structure(arg) for arg in args)
+
+        if None in keys:
+            return None
+
+        return kind + keys
+
+    def shared(self, input):
+        """ The aux set equal to an expression of the same structure as input
+            before, so that repeated subtrees share an aux and epigraph.
+            None if there is none """
+
+        key = self.structure(input)
+
+        if key is None:
+            return None
+
+        return self.auxiliaries.get(key)
+
+    def share(self, input, aux):
+        """ Record aux as the aux of expressions structured like input """
+
+        key = self.structure(input)
+
+        if key is not None:
+            self.auxiliaries[key] = aux
+
     def smith_form(self):
         """ Convert to Smith Form """
 
@@ -218,29 +369,84 @@ class Canonicalize(Problem):
             print('----Graph Form----')
             print(self)
 
+    def gather_columns(self):
+        """ Map each variable in self.vars to its column in the matrices.
+            Keyed by id, because variables are matched by identity """
+
+        self.columns = { id(v):m for m, v in enumerate(self.vars.values()) }
+
+    def column_coefficients(self, expr):
+        """ Walk the terms of expr once, and return the coefficient of each
+            variable found, as {column : coefficient} in column order.
+            Coefficients are normalized, and those which come to zero are
+            left out, so they take no entry of the matrices """
+
+        if issubclass(type(expr), sums.sum):
+            terms = expr.args
+
+            # Smith form replaces args in place, so refresh the cached stock
+            # of vars and offsets which the stuffing relies on
+            expr.nterms = len(expr.args)
+            expr.vars   = expr.vars_in_args()
+            expr.offset = expr.offsets()
+        else:
+            terms = [expr]
+
+        factors = {}
+        for term in terms:
+
+            if term.is_var:
+                var   = term
+                coeff = sym.Constant(1)
+
+            elif issubclass(type(term), Atom):
+                var = term.vars_in_args()
+
+                if var is None:  # an offset
+                    continue
+
+                coeff = term.coefficient_of(var)
+
+            else:
+                continue
+
+            column = self.columns.get(id(var))
+
+            if column is not None and coeff.value != 0:
+                factors.setdefault(column, []).append(coeff)
+
+        coefficients = {}
+        for m in sorted(factors):
+
+            coeff = normalize(sums.sum(*factors[m]))
+
+            if type(coeff) is not sym.Constant or coeff.value != 0:
+                coefficients[m] = coeff
+
+        return coefficients
+
     def stuff(self, n, constr, matrix, vector):
         """ Generalized form of matrix stuffing """
 
-        for m, v in enumerate(self.vars.values()):
+        for m, coeff in self.column_coefficients(constr.expr).items():
 
-            if constr.expr.has_var(v):
-                matrix['row'].append(n)
-                matrix['col'].append(m)
-                matrix['val'].append(constr.expr.coefficient_of(v))
+            matrix['row'].append(n)
+            matrix['col'].append(m)
+            matrix['val'].append(coeff)
 
-                if self.verbose >= 1:
-                    print(constr.expr,'>>>',v,'>>>', matrix['val'][-1])
+            if self.verbose >= 1:
+                print(constr.expr,'>>>',self.vars_list[m],'>>>', coeff)
 
         # -1 * offset because in constr.expr it's on the left hand side
         if constr.expr.offset is not None:
 
             if type(constr.expr.offset) in [sym.Constant, int, float]:
-                vector.append(-1 * constr.expr.offset)
+                vector.append(normalize(-1 * constr.expr.offset))
 
             elif len(constr.expr.offset) > 1:
-                vector.append(-1 * sum(constr.expr.offset))
+                vector.append(normalize(-1 * sum(constr.expr.offset)))
             else:
-                vector.append(-1 * constr.expr.offset[0])
+                vector.append(normalize(-1 * constr.expr.offset[0]))
         else:
             vector.append( 0.0 )
 
@@ -256,6 +462,12 @@ class Canonicalize(Problem):
         self.b = []
         self.h = []
 
+        self.gather_columns()
+        self.vars_list = list(self.vars.values())
+
+        if (hasattr(self.objective,'coefficient_of')):
+            objective = self.column_coefficients(self.objective)
+
         # Build the c vector : all the coefficients making up the objective
         if self.verbose == 2: track = {
                                 'sumtime':0, 'count':0, 'last':time(),
@@ -287,7 +499,8 @@ class Canonicalize(Problem):
 
             if (hasattr(self.objective,'coefficient_of')):
                 # Will add a Constant(0) if v not in self.objective
-                self.c += [self.objective.coefficient_of(v)]
+                self.c += [objective.get(self.columns[id(v)],
+                                         sym.Constant(0))]
 
             elif v is self.objective:
                 self.c += [1.0]
@@ -329,6 +542,388 @@ class Canonicalize(Problem):
 
         self.ns = dict(ns)  # save for later use
 
+    def eliminate_auxiliaries(self):
+        """
+            Presolve: substitute out the auxiliary symbols which Smith form
+            defined by affine equalities.
+
+            A row of Ax = b with an auxiliary x_j, whose coefficient a is a
+            nonzero constant, gives x_j = (b_i - sum of a_k x_k) / a. This
+            is substituted into every other row of A and G which x_j is in,
+            then the row and x_j are removed. Rows of G only change by an
+            affine substitution, so their cones stay valid.
+
+            Auxiliaries in the objective, rows with parametric functions,
+            and eliminations which would add entries to the matrices are
+            left alone. Sets self.eliminated, the number of 'variables' and
+            'rows' which were removed
+        """
+
+        def terms(value):
+            """ Monomials of value, None unless in parameters only """
+
+            try:
+                monomials = polynomial(value)
+            except TypeError:
+                return None
+
+            if any(type(f) is not sym.Parameter for c, factors in monomials
+                                                    for f in factors):
+                return None
+
+            return monomials
+
+        def combine(terms):
+            """ Merge like terms, dropping those which come to zero """
+
+            merged = {}
+            for coeff, factors in terms:
+
+                key = tuple(sorted(id(f) for f in factors))
+                c, f = merged.get(key, (0.0, factors))
+                merged[key] = (c + coeff, f)
+
+            return [(c, f) for c, f in merged.values() if c != 0]
+
+        rows     = {}  # ('A' or 'G', row) : {column : monomials}
+        rhs      = {}  # ('A' or 'G', row) : monomials of b or h
+        original = {}  # (row key, column) : value, until it is changed
+        where    = { m:set() for m in range(len(self.vars_list)) }
+
+        for name, matrix, vector in [('A', self.A, self.b),
+                                     ('G', self.G, self.h)]:
+
+            for i, value in enumerate(vector):
+                rows[(name, i)] = {}
+                rhs[(name, i)]  = terms(value)
+
+            for i, m, value in zip(matrix['row'], matrix['col'],
+                                   matrix['val']):
+
+                rows[(name, i)][m] = terms(value)
+                original[((name, i), m)] = value
+                where[m].add((name, i))
+
+        def plain(key):
+            return (rhs[key] is not None and
+                    all(t is not None for t in rows[key].values()))
+
+        objective = [terms(value) for value in self.c]
+
+        auxiliary = [type(v) is sym.Symbol and objective[m] is not None
+                        and combine(objective[m]) == []
+                            for m, v in enumerate(self.vars_list)]
+
+        eliminated = set()
+        moved      = set()  # rows whose b or h has changed
+        changed    = True
+
+        while changed:
+            changed = False
+
+            for key in [key for key in rows if key[0] == 'A']:
+
+                if key not in rows or not plain(key):
+                    continue
+
+                row  = rows[key]
+                best = None
+
+                for j, pivot in row.items():
+
+                    if (not auxiliary[j] or len(pivot) != 1
+                                         or pivot[0][1] != ()):
+                        continue
+
+                    others = where[j] - {key}
+
+                    if not all(plain(other) for other in others):
+                        continue
+
+                    fill = (sum(len(set(row) - {j} - set(rows[other]))
+                                    for other in others)
+                            - len(row) - len(others))
+
+                    if fill <= 0 and (best is None or fill < best[0]):
+                        best = (fill, j)
+
+                if best is None:
+                    continue
+
+                # x_j = (b_i - sum of a_k x_k) / a, into the other rows
+                j = best[1]
+                a = row[j][0][0]
+
+                for other in where[j] - {key}:
+
+                    g = rows[other].pop(j)
+
+                    for m, coeff in row.items():
+                        if m == j:
+                            continue
+
+                        new = combine(rows[other].get(m, []) +
+                                      [(-cg * cm / a, fg + fm)
+                                            for cg, fg in g
+                                                for cm, fm in coeff])
+                        if new:
+                            rows[other][m] = new
+                            where[m].add(other)
+                        else:
+                            rows[other].pop(m, None)
+                            where[m].discard(other)
+
+                        original.pop((other, m), None)
+
+                    moved.add(other)
+                    rhs[other] = combine(rhs[other] +
+                                         [(-cg * cb / a, fg + fb)
+                                            for cg, fg in g
+                                                for cb, fb in rhs[key]])
+
+                for m in row:
+                    where[m].discard(key)
+
+                del rows[key], rhs[key]
+
+                eliminated.add(j)
+                changed = True
+
+        self.eliminated = {'variables' : len(eliminated),
+                           'rows' : len(eliminated)}
+
+        if not eliminated:
+            return
+
+        # Renumber what is left
+        kept    = [m for m in range(len(self.vars_list)) if m not in eliminated]
+        columns = { m:n for n, m in enumerate(kept) }
+
+        names     = list(self.vars)
+        self.vars = { names[m]:self.vars_list[m] for m in kept }
+        self.vars_list = list(self.vars.values())
+        self.c = [self.c[m] for m in kept]
+
+        self.gather_columns()
+
+        for name, vector in [('A', 'b'), ('G', 'h')]:
+
+            matrix = {'row':[], 'col':[], 'val':[]}
+            values = []
+
+            for key in sorted(k for k in rows if k[0] == name):
+
+                for m in sorted(rows[key]):
+
+                    if (key, m) in original:
+                        value = original[(key, m)]
+                    else:
+                        value = from_terms(rows[key][m])
+
+                    matrix['row'].append(len(values))
+                    matrix['col'].append(columns[m])
+                    matrix['val'].append(value)
+
+                if key in moved:
+                    values.append(from_terms(rhs[key]))
+                else:
+                    values.append(getattr(self, vector)[key[1]])
+
+            setattr(self, name, matrix)
+            setattr(self, vector, values)
+
+        self.ns['eq'] = len(self.b)
+
+    def merge_rows(self):
+        """
+            Presolve: remove the rows of Ax = b, and of the linear part of
+            Gx <= h, which repeat another row. Of the linear rows with the
+            same left hand side and constant h, only the tightest is kept,
+            rows on one variable being scaled to a bound on it first. The
+            rows of the cones are left alone.
+
+            Sets self.removed, the rows of 'A' and 'G' (numbered as they
+            were stuffed, and any auxiliaries eliminated) which were removed
+        """
+
+        def key(value):
+            """ Hashable form of a coefficient, None if there is none """
+
+            try:
+                terms = polynomial(value)
+            except TypeError:
+                return None
+
+            return tuple(sorted((tuple(sorted(id(f) for f in factors)), coeff)
+                                    for coeff, factors in terms))
+
+        def constant(value):
+            """ Value of a constant coefficient, None if not constant """
+
+            terms = key(value)
+
+            if terms is None or any(factors != () for factors, c in terms):
+                return None
+
+            return sum(c for factors, c in terms)
+
+        def rows_of(matrix, count):
+            rows = [[] for i in range(count)]
+            for i, m, value in zip(matrix['row'], matrix['col'], matrix['val']):
+                rows[i].append((m, value))
+            return rows
+
+        A = rows_of(self.A, len(self.b))
+        G = rows_of(self.G, len(self.h))
+
+        self.removed = {'A' : [], 'G' : []}
+
+        # Equalities, which must repeat exactly
+        seen = set()
+        for i, row in enumerate(A):
+
+            lhs = tuple(sorted((m, key(value)) for m, value in row))
+            rhs = key(self.b[i])
+
+            if rhs is None or any(k is None for m, k in lhs):
+                continue
+
+            if (lhs, rhs) in seen:
+                self.removed['A'].append(i)
+            else:
+                seen.add((lhs, rhs))
+
+        # Linear inequalities, by their left hand side
+        seen  = set()
+        bound = {}  # left hand side : (tightest h, its row)
+        for i, row in enumerate(G[:self.dims['l']]):
+
+            h = constant(self.h[i])
+            a = constant(row[0][1]) if len(row) == 1 else None
+
+            if a:
+                lhs = (row[0][0], a > 0)  # x_m <= h / a, or x_m >= h / a
+
+                if h is not None:
+                    h = h / abs(a)
+            else:
+                lhs = tuple(sorted((m, key(value)) for m, value in row))
+
+                if any(k is None for m, k in lhs):
+                    continue
+
+            if h is not None:
+
+                if lhs not in bound:
+                    bound[lhs] = (h, i)
+                    continue
+
+                tightest, j = bound[lhs]
+
+                if h < tightest:
+                    bound[lhs] = (h, i)
+                    self.removed['G'].append(j)
+                else:
+                    self.removed['G'].append(i)
+
+            elif key(self.h[i]) is not None:
+
+                # A parametric h cannot be scaled by a, so a row on one
+                # variable only repeats a row with the same coefficient
+                exact = (lhs, a, key(self.h[i]))
+
+                if exact in seen:
+                    self.removed['G'].append(i)
+                else:
+                    seen.add(exact)
+
+        if self.removed['A'] == self.removed['G'] == []:
+            return
+
+        self.removed['G'].sort()
+
+        # Rebuild the matrices without the removed rows
+        for name, vector, rows in [('A', 'b', A), ('G', 'h', G)]:
+
+            removed = set(self.removed[name])
+            matrix  = {'row':[], 'col':[], 'val':[]}
+            values  = []
+
+            for i, row in enumerate(rows):
+
+                if i in removed:
+                    continue
+
+                for m, value in row:
+                    matrix['row'].append(len(values))
+                    matrix['col'].append(m)
+                    matrix['val'].append(value)
+
+                values.append(getattr(self, vector)[i])
+
+            setattr(self, name, matrix)
+            setattr(self, vector, values)
+
+        self.dims['l'] -= len(self.removed['G'])
+        self.ns['eq']  = len(self.b)
+        self.ns['le']  = len(self.h)
+
+    def order_columns(self):
+        """
+            Permute the variables (the columns of the matrices) by the
+            ordering named in self.ordering, computed from the pattern of A
+            and G:
+                'rcm'        : reverse Cuthill-McKee, for a small bandwidth
+                'min_degree' : minimum degree, for little fill in factoring
+
+            Columns are adjacent when they share a row of A, a linear row
+            of G, or a second order cone. Sets self.permutation, the
+            original column of each column, and self.bandwidth, before and
+            after. Solutions still map back by name through self.vars
+        """
+
+        orderings = {'rcm'        : sparse.reverse_cuthill_mckee,
+                     'min_degree' : sparse.minimum_degree}
+
+        if self.ordering not in orderings:
+            raise(ValueError('Ordering ' + str(self.ordering) + ' is not one'
+                             ' of ' + str(list(orderings))))
+
+        # Rows of G past the linear ones are in cones, grouped together
+        cones = []
+        for n, dim in enumerate(self.dims['q']):
+            cones += [n] * dim
+
+        groups = {}
+        for i, m in zip(self.A['row'], self.A['col']):
+            groups.setdefault(('A', i), set()).add(m)
+
+        for i, m in zip(self.G['row'], self.G['col']):
+            if i < self.dims['l']:
+                groups.setdefault(('l', i), set()).add(m)
+            else:
+                groups.setdefault(('q', cones[i - self.dims['l']]), set()).add(m)
+
+        adjacency = sparse.column_adjacency(len(self.vars), groups.values())
+
+        order = orderings[self.ordering](adjacency)
+
+        self.permutation = order
+        self.bandwidth = (sparse.bandwidth(adjacency, range(len(order))),
+                          sparse.bandwidth(adjacency, order))
+
+        columns = { m:k for k, m in enumerate(order) }
+
+        names     = list(self.vars)
+        self.vars = { names[m]:self.vars_list[m] for m in order }
+        self.vars_list = list(self.vars.values())
+        self.c = [self.c[m] for m in order]
+
+        self.gather_columns()
+
+        for matrix in [self.A, self.G]:
+            matrix['col'] = [columns[m] for m in matrix['col']]
+
     def sparse_form(self):
         """ Convert COO Matrices to CSC / CCS form """
 
@@ -349,19 +944,20 @@ class Canonicalize(Problem):
         #print('about to expand...')
 
         if self.verbose == 2: print('... Expanding')
-        n = 0
-        expand_at = {}
-        for constr in self.constraints:
-            if self.verbose == 2: print('.',end='',flush=True)
-            expand_at[n] = constr.expand()
-            n += 1
-            #print('n',n,constr, expand_at[n])
+        with self.measure('expand'):
+            n = 0
+            expand_at = {}
+            for constr in self.constraints:
+                if self.verbose == 2: print('.',end='',flush=True)
+                expand_at[n] = constr.expand()
+                n += 1
+                #print('n',n,constr, expand_at[n])
 
-        self.constraints = []  # reset and refill
+            self.constraints = []  # reset and refill
 
-        # Apply the expansions
-        for n, expanded in expand_at.items():
-            self.constraints += expanded
+            # Apply the expansions
+            for n, expanded in expand_at.items():
+                self.constraints += expanded
 
         if self.verbose:
             print()
@@ -369,15 +965,33 @@ class Canonicalize(Problem):
             print(self)
 
         if self.verbose == 2: print('... Gathering')
-        self.gather_symbols()
+        with self.measure('gather'):
+            self.gather_symbols()
 
         if self.verbose == 2: print('... Stuffing')
         # Then, stuff the problem into the canonical matrices
-        self.stuff_form()
+        with self.measure('stuff'):
+            self.stuff_form()
+
+        self.eliminated = {'variables' : 0, 'rows' : 0}
+        self.removed = {'A' : [], 'G' : []}
+        if self.presolve:
+            with self.measure('presolve'):
+                self.eliminate_auxiliaries()
+                self.merge_rows()
+
+        self.permutation = None
+        if self.ordering is not None:
+            with self.measure('order'):
+                self.order_columns()
 
         if self.verbose:
             print()
             print('----Matrices----')
+            print('eliminated', self.eliminated)
+            print('removed', self.removed)
+            if self.permutation is not None:
+                print('bandwidth', self.bandwidth)
             print('n', len(self.vars))
             print('v', list_pprint(list(self.vars.values())))
             print('c', list_pprint(self.c))
@@ -391,7 +1005,8 @@ class Canonicalize(Problem):
             print('h', list_pprint(self.h))
             print('dims', self.dims)
 
-        self.sparse_form()
+        with self.measure('sparse_form'):
+            self.sparse_form()
 
         if self.verbose:
             print()
@@ -407,82 +1022,34 @@ class Canonicalize(Problem):
             print('dims', self.dims)
 
 
-    def assign_values(self, parameters, debug=0):
-        """ Assign constants & parameters real values as given in parameters """
-
-        # Preprocess parameters, replacing arrays with a bunch of elements
-
-        elements = {}
-        for name, item in parameters.items():
-            if type(item) not in [float, int] and hasattr(item, '__getitem__'):
-
-                # Only other reasonable thing is a numpy array
-
-                for n in range(item.shape[0]):
-
-                    if len(item.shape) > 1:
-                        for m in range(item.shape[1]):
-
-                            elem_name = name + index_string((n, m))
-                            elements[elem_name] = item[n, m]
-
-                    else:
-                        elem_name = name + index_string((n, 0))
-                        elements[elem_name] = item[n]
-
-        parameters.update(elements)
-
-        # Replace all constants with actual values
-
-        matrices = [self.G.A, self.h, self.c]
+    def compile(self):
+        """ Compile the symbolic matrices into a reusable ParameterMapping,
+            which evaluates numeric data for any set of parameter values """
 
-        if self.A is not None:
-            matrices += [self.A.A, self.b]
+        if self.mapping is None:
+            self.mapping = ParameterMapping(self)
 
-        news = [[],[],[],[],[]]
-        for n, matrix in enumerate(matrices):
+        return self.mapping
 
-            if debug: print('---- IN MATRIX',n)
-
-            for val in matrix:
-
-                if debug: print('____________ VAL IS',val)
-
-                if type(val) is sym.Constant:
-                    news[n].append(val.value)
-
-                elif type(val) in [float, int]:
-                    news[n].append(val)
-
-                elif type(val) is sym.Parameter:
-
-                    try:
-                        news[n].append(parameters[val.name])
-
-                    except KeyError:
-                        raise(KeyError('Parameter named '+ val.name +
-                                        ' not supplied'))
-
-                elif issubclass(type(val), Atom):
-
-                    new = val.assign_values(parameters)
-                    news[n].append(new)
-
-                elif issubclass(type(val), Function):
+    def assign_values(self, parameters, debug=0):
+        """ Assign constants & parameters real values as given in parameters
 
-                    if hasattr(val, 'parametric') and val.parametric:
-                        news[n].append(val.value(parameters))
+            The symbolic matrices are left intact, so this may be called
+            again with new values. The numeric data is stored in self.data,
+            as the arrays 'c', 'h', 'b' and the CSC values of 'G' and 'A' """
 
-                    else:
-                        raise(Exception(str(val) + 'non-parametric function '
-                                                    'was found in a matrix'))
+        self.data = self.compile().evaluate(parameters)
 
-                else:
-                    print('WARNING: No assignment category found for',val)
-                    news[n].append(val)
+        if debug:
+            for name, values in self.data.items():
+                print('----', name, list_pprint(values))
 
+        return self.data
 
-        self.G.A, self.h, self.c = news[0:3]
+    def assign_batch(self, parameters, chunk = 4096):
+        """ Assign K parameter sets at once, given as arrays with a leading
+            batch dimension. Returns a dict of 2-D arrays (K, length) of the
+            numeric 'c', 'h', 'b' and the CSC values of 'G' and 'A', which
+            all share the sparsity pattern of self.G and self.A """
 
-        if self.A is not None:
-            self.A.A, self.b = news[3:]
+        return self.compile().evaluate_batch(parameters, chunk = chunk)
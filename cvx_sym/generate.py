@@ -1,7 +1,11 @@
 from cvx_sym.operations.functions import Function
 from cvx_sym.canonicalize import Canonicalize
-from cvx_sym.symbolic import Symbol, Vector
+from cvx_sym.mapping import polynomial
+from cvx_sym.symbolic import Symbol, Vector, Parameter
+from cvx_sym.errors import ShapeError
 from cvx_sym import templates
+from cvx_sym.templates.functions import names as function_names
+import numpy as np
 import jinja2
 import pathlib
 
@@ -14,7 +18,8 @@ class Generate:
 
     def __init__(self, problem, name = 'embedded', folder = None,
                                 lang = 'c', verbose = False,
-                                temp = 'main_set'):
+                                temp = 'main_set', presolve = True,
+                                ordering = None, report = None):
         lang = lang.lower()
 
         self.problem = problem
@@ -26,13 +31,19 @@ class Generate:
             self.location = pathlib.Path(folder) / self.name
 
         self.set = temp  # which set of templates to use?
+        self.verbose = verbose
 
-        self.canonical = Canonicalize(self.problem, verbose = verbose)
+        self.canonical = Canonicalize(self.problem, verbose = verbose,
+                                      presolve = presolve,
+                                      ordering = ordering, report = report)
+        self.report = self.canonical.report
 
         if lang not in ['c']:  # Catch unimplemented languages
             raise(NotImplemented('Only C99 Code Generation Supported'))
 
-        self.write(lang)
+        # Temporaries of the generated functions join the problem's symbols
+        with self.canonical.registry, self.canonical.measure('generate'):
+            self.write(lang)
 
     def render(self, name, into):
         """ Activate the template with given name, meaning: write it """
@@ -93,6 +104,429 @@ class Generate:
                         if function.name not in self.native_func_defs:
                             self.native_func_defs[function.name] = new_func
 
+    def split_constant(self, problem_arrays):
+        """ Separate the parameter-free entries of each array, which are
+            written as const initializers, from those which depend on
+            parameters and so need code to be computed at runtime """
+
+        for name, array in problem_arrays['pfloat'].items():
+
+            array['constant']   = []  # initializer, 0 where parametric
+            array['parametric'] = []  # (index, value) pairs
+
+            for n, value in enumerate(array['values']):
+
+                if type(value) is ParametricFunction:
+                    terms = None
+                else:
+                    terms = polynomial(value)
+
+                if terms is not None and all(len(f) == 0 for c, f in terms):
+                    value = float(sum(c for c, f in terms))
+                    array['constant'] += [repr(value)]
+                else:
+                    array['constant'] += ['0.0']
+                    array['parametric'] += [(n, value)]
+
+        for name, array in problem_arrays['idxint'].items():
+            array['constant'] = [str(int(value)) for value in array['values']]
+
+        problem_arrays['idxint']['q'] = {
+                            'values'   : self.canonical.dims['q'],
+                            'length'   : len(self.canonical.dims['q']),
+                            'constant' : [str(int(d)) for d in
+                                                    self.canonical.dims['q']]}
+
+    def locate_kkt(self, problem_arrays):
+        """ For each parametric entry of G and A, find its column and the
+            row it takes in ECOS's (unpermuted) KKT matrix, so that updates
+            can be written straight into the factorized system.
+
+                K = [ 0  A'  G' ]    where each second order cone is
+                    [ A  0   0  ]    expanded by 2 rows (ECOS CONEMODE 0)
+                    [ G  0  -W2 ]
+        """
+
+        n = self.context['n']
+        p = self.context['p']
+        l = self.canonical.dims['l']
+
+        # Row of the KKT matrix of each row of G
+        G_rows = [n + p + i for i in range(l)]
+        for cone, q in enumerate(self.canonical.dims['q']):
+            G_rows += [n + p + len(G_rows) + 2 * cone + r for r in range(q)]
+
+        for name, matrix, rows in [('Gpr', self.canonical.G, G_rows),
+                                   ('Apr', self.canonical.A, None)]:
+
+            if name not in problem_arrays['pfloat']:
+                continue
+
+            array = problem_arrays['pfloat'][name]
+            array['kkt'] = []  # (index, column, KKT row) of each parametric
+
+            for k, value in array['parametric']:
+
+                column = int(np.searchsorted(matrix.IA, k, side = 'right')) - 1
+                row    = int(matrix.JA[k])
+
+                if rows is None:  # A
+                    row = n + row
+                else:
+                    row = rows[row]
+
+                array['kkt'] += [(k, column, row)]
+
+    def number_entries(self, problem_arrays):
+        """ Number the parametric entries of all arrays, and find which
+            parameters each of them depends on """
+
+        # Parameter (by name) which each parameter element belongs to
+        parents = {}
+        for name, parm in self.canonical.parms.items():
+            if parm.index is None:
+
+                parents[name] = name
+                for element in parm.elements.values():
+                    parents[element.name] = name
+
+        def leaves(expr):
+
+            if type(expr) is Parameter:
+                return [expr]
+
+            elif type(expr) is ParametricFunction:
+                args = expr.args + [pair[1] for pair in expr.context['assign']]
+
+            else:
+                args = getattr(expr, 'args', [])
+
+            return [leaf for arg in args for leaf in leaves(arg)]
+
+        self.entries = []
+
+        for name, array in problem_arrays['pfloat'].items():
+            for slot, (n, value) in enumerate(array['parametric']):
+
+                if type(value) is ParametricFunction:
+                    assign = value.assign
+                else:
+                    assign = ''
+
+                self.entries += [{'array' : name, 'index' : n, 'slot' : slot,
+                                  'value' : value, 'assign' : assign,
+                                  'parents' : sorted(set(parents[leaf.name]
+                                                for leaf in leaves(value)))}]
+
+        # Entries of each array are numbered from start until stop
+        self.entry_ranges = []
+        for name, array in problem_arrays['pfloat'].items():
+
+            start = self.entry_ranges[-1][2] if self.entry_ranges else 0
+            self.entry_ranges += [(name, start,
+                                   start + len(array['parametric']))]
+
+    def element_offsets(self):
+        """ Parent and (row major) offset of each parameter element """
+
+        elements = {}
+        for name, parm in self.canonical.parms.items():
+            if parm.index is None:
+
+                elements[name] = (name, 0)
+                for (i, j), element in parm.elements.items():
+                    elements[element.name] = (name, i * parm.shape[1] + j)
+
+        return elements
+
+    def find_runs(self):
+        """ Collect parametric entries which are a coefficient times one
+            parameter element into runs, where the entry number and element
+            advance by a fixed step. Repeated blocks (the same dynamics at
+            every stage of a horizon) become a few long runs, so the code
+            which evaluates them does not grow with the number of blocks.
+
+            Each run is written as a row of a table """
+
+        elements = self.element_offsets()
+
+        # Entries (entry, offset) by array, coefficient and parameter
+        simple = {}
+        for e, entry in enumerate(self.entries):
+
+            if type(entry['value']) is ParametricFunction:
+                continue
+
+            terms = polynomial(entry['value'])
+
+            if (len(terms) != 1 or len(terms[0][1]) != 1
+                                 or type(terms[0][1][0]) is not Parameter):
+                continue
+
+            coeff, (element,) = terms[0]
+            parent, offset = elements[element.name]
+
+            key = (entry['array'], coeff, parent)
+            simple.setdefault(key, []).append((e, offset))
+
+        def progressions(members):
+            """ Split members, in order, into runs with fixed steps """
+
+            runs, run = [], []
+            for e, offset in members:
+
+                if len(run) >= 2:
+                    (e0, o0), (e1, o1) = run[-2:]
+
+                    if e - e1 != e1 - e0 or offset - o1 != o1 - o0:
+
+                        # A pair which can not be extended gives up its
+                        # first member, the second may start a longer run
+                        if len(run) == 2:
+                            runs += [run[:1]]
+                            run = run[1:]
+                        else:
+                            runs += [run]
+                            run = []
+
+                run += [(e, offset)]
+
+            return runs + [run] if run else runs
+
+        parameters = [name for name, parm in self.canonical.parms.items()
+                                                    if parm.index is None]
+        self.runs = []
+
+        for (array, coeff, parent), members in simple.items():
+
+            # First the same element at a fixed step of entries, then
+            # consecutive elements of what is left
+            same = {}
+            for e, offset in members:
+                same.setdefault(offset, []).append((e, offset))
+
+            runs, rest = [], []
+            for offset_members in same.values():
+                for run in progressions(offset_members):
+                    (runs if len(run) > 1 else rest).append(run)
+
+            runs += progressions(sorted(m for run in rest for m in run))
+
+            for run in runs:
+
+                e0, o0 = run[0]
+                e1, o1 = run[1] if len(run) > 1 else run[0]
+
+                self.runs += [{'entry' : e0, 'entry_step' : e1 - e0,
+                               'count' : len(run),
+                               'parameter' : parameters.index(parent),
+                               'offset' : o0, 'offset_step' : o1 - o0,
+                               'coeff' : repr(float(coeff)),
+                               'parents' : [parent]}]
+
+        self.runs.sort(key = lambda run: run['entry'])
+
+    def find_gathers(self):
+        """ Write the entries which are not in runs, but are still
+            polynomials in the parameter elements, as rows of a gather
+            table: the entries, and each term's coefficient and the
+            (parameter, offset) of its factors. Only parametric functions
+            are left to be written as expressions """
+
+        elements   = self.element_offsets()
+        parameters = [name for name, parm in self.canonical.parms.items()
+                                                    if parm.index is None]
+
+        in_runs = set(run['entry'] + t * run['entry_step']
+                        for run in self.runs for t in range(run['count']))
+
+        self.gathers     = []
+        self.expressions = []
+
+        for e, entry in enumerate(self.entries):
+
+            if e in in_runs:
+                continue
+
+            if type(entry['value']) is not ParametricFunction:
+                terms = polynomial(entry['value'])
+            else:
+                terms = None
+
+            if terms is None or any(type(f) is not Parameter
+                                        for c, factors in terms
+                                            for f in factors):
+
+                self.expressions += [{'entries' : [e],
+                                      'value' : entry['value'],
+                                      'assign' : entry['assign'],
+                                      'parents' : entry['parents']}]
+                continue
+
+            terms = [(float(coeff),
+                      tuple(sorted((parameters.index(elements[f.name][0]),
+                                    elements[f.name][1]) for f in factors)))
+                        for coeff, factors in terms]
+
+            self.gathers += [{'entries' : [e], 'terms' : terms,
+                              'parents' : entry['parents']}]
+
+    def eliminate_common(self):
+        """ Common subexpressions of the gather table and the expressions,
+            so that each is computed once per update:
+
+                rows with the same terms become one row, written into
+                    each of their entries
+                products of parameter elements used by more than one row
+                    are computed once, into prob->product
+                the same parametric function of the same arguments is
+                    evaluated once, and written into each of its entries
+
+            Sets self.cse, a report of the flops evaluating the tables
+            takes, and how many this saves """
+
+        def flops(gathers):
+
+            count = 0
+            for gather in gathers:
+                for coeff, factors in gather['terms']:
+                    count += len(factors)  # multiplies, including coeff
+
+                count += len(gather['terms']) - 1  # adds
+
+            return count
+
+        runs   = sum(run['count'] for run in self.runs)
+        before = runs + flops(self.gathers)
+
+        # Rows with the same terms
+        rows = {}
+        for gather in self.gathers:
+
+            key = tuple(gather['terms'])
+
+            if key in rows:
+                rows[key]['entries'] += gather['entries']
+            else:
+                rows[key] = gather
+
+        merged = len(self.gathers) - len(rows)
+        self.gathers = list(rows.values())
+
+        # Products used by more than one row
+        uses = {}
+        for gather in self.gathers:
+            for coeff, factors in gather['terms']:
+                if len(factors) > 1:
+                    uses[factors] = uses.get(factors, 0) + 1
+
+        parameters = [name for name, parm in self.canonical.parms.items()
+                                                    if parm.index is None]
+        self.products = []
+        shared = {}
+        for factors, count in uses.items():
+            if count > 1:
+
+                shared[factors] = len(self.products)
+                self.products += [{'factors' : factors,
+                                   'parents' : sorted(set(parameters[p]
+                                                    for p, o in factors))}]
+
+        for gather in self.gathers:
+            gather['terms'] = [(coeff, ((-1, shared[factors]),)
+                                            if factors in shared else factors)
+                                    for coeff, factors in gather['terms']]
+
+        after = (runs + flops(self.gathers) +
+                 sum(len(product['factors']) - 1 for product in self.products))
+
+        # The same parametric function of the same arguments
+        def key(expression):
+
+            value = expression['value']
+
+            if type(value) is not ParametricFunction:
+                return str(value)
+
+            vectors = { id(sym) : vector
+                            for sym, vector in value.context['assign'] }
+
+            return (value.func.name, tuple(str(vectors.get(id(arg), arg))
+                                                for arg in value.args))
+
+        expressions = {}
+        for expression in self.expressions:
+
+            if key(expression) in expressions:
+                expressions[key(expression)]['entries'] += \
+                                                    expression['entries']
+            else:
+                expressions[key(expression)] = expression
+
+        calls = len(self.expressions) - len(expressions)
+        self.expressions = list(expressions.values())
+
+        self.cse = {'flops' : before, 'flops_saved' : before - after,
+                    'rows_merged' : merged,
+                    'products_shared' : len(self.products),
+                    'expressions_merged' : calls}
+
+    def flatten_gathers(self):
+        """ The gather table and products as flat arrays, as in CSR: the
+            entries of row i are from entry[entry_start[i]] until
+            entry_start[i+1], its terms from term[i] until term[i+1], and
+            the factors of term k from factor[k] until factor[k+1]. The
+            factors of product j are from product[j] until product[j+1] """
+
+        table = {'entry_start' : [0], 'entry' : [], 'term' : [0],
+                 'coeff' : [], 'factor' : [0], 'element' : [],
+                 'product' : [0]}
+
+        for gather in self.gathers:
+
+            table['entry']       += gather['entries']
+            table['entry_start'] += [len(table['entry'])]
+            table['term']        += [table['term'][-1] + len(gather['terms'])]
+
+            for coeff, factors in gather['terms']:
+
+                table['coeff']   += [repr(coeff)]
+                table['factor']  += [table['factor'][-1] + len(factors)]
+                table['element'] += list(factors)
+
+        # Factors of the products follow those of the terms
+        table['product'] = [table['factor'][-1]]
+        for product in self.products:
+
+            table['element'] += list(product['factors'])
+            table['product'] += [table['product'][-1] +
+                                                len(product['factors'])]
+
+        self.gather_table = table
+
+    def track_dependencies(self):
+        """ Find the groups of entries which depend on each parameter, so
+            that setting one parameter only updates the entries referencing
+            it. Groups are numbered products first, then runs, gathers
+            and expressions. Each product comes before the rows using it,
+            which depend on the same parameters and more """
+
+        groups = self.products + self.runs + self.gathers + self.expressions
+
+        self.dependencies = { name : [] for name, parm in
+                                self.canonical.parms.items()
+                                    if parm.index is None }
+
+        for g, group in enumerate(groups):
+            for parent in group['parents']:
+                self.dependencies[parent] += [g]
+
+        # Flattened as in CSR, the groups of parameter i are from
+        # dependency[dependency_start[i]] until dependency_start[i+1]
+        self.dependency_start = [0]
+        for groups in self.dependencies.values():
+            self.dependency_start += [self.dependency_start[-1] + len(groups)]
+
     def write(self, lang):
         """ Activates templates and writes them to disk """
 
@@ -145,6 +579,7 @@ class Generate:
             })
 
         self.adapt_native(problem_arrays, lang)
+        self.split_constant(problem_arrays)
 
         self.context = {}  # Build the template context
 
@@ -165,11 +600,95 @@ class Generate:
         self.context['native_functions'] = self.native_functions # add functions
         self.context['native_func_defs'] = self.native_func_defs # add defines
 
+        self.locate_kkt(problem_arrays)
+        self.number_entries(problem_arrays)
+        self.find_runs()
+        self.find_gathers()
+        self.eliminate_common()
+        self.flatten_gathers()
+        self.track_dependencies()
+
+        if self.verbose:
+            print('Common subexpressions save', self.cse['flops_saved'],
+                  'of', self.cse['flops'], 'flops gathering the matrices')
+
+        # Parameters by name, as they are stored in the problem struct
+        self.context['parameters'] = {
+            name : {'scalar' : parm.shape_string == '[1][1]',
+                    'size'   : parm.shape[0] * parm.shape[1],
+                    'row'    : '[' + str(parm.shape[1]) + ']'}
+                for name, parm in parms.items() if parm.index is None }
+
+        # Names of the locals of functions which alias the parameters, apart
+        # from the name of every symbol and native function
+        taken = set(self.canonical.registry.symbols) | set(
+                    function_names.values())
+
+        self.context['local_names'] = {}
+        for local in ['prob', 'n']:
+
+            name = local
+            while name in taken:
+                name += '_'
+
+            self.context['local_names'][local] = name
+
+        self.context['entries'] = self.entries            # parametric entries
+        self.context['entry_ranges'] = self.entry_ranges  # array : entries
+        self.context['runs'] = self.runs                  # table of runs
+        self.context['gathers'] = self.gathers            # gather table
+        self.context['gather_table'] = self.gather_table
+        self.context['products'] = self.products          # shared products
+        self.context['cse'] = self.cse                    # what CSE saved
+        self.context['expressions'] = self.expressions    # other entries
+        self.context['dependencies'] = self.dependencies  # parameter : entries
+        self.context['dependency_start'] = self.dependency_start
+
         self.pull_solver()
 
         for template in templates.template_files_of_set[self.set]:
             self.render(template, self.location.absolute())
 
+    def write_parameter_sets(self, filename, parameters):
+        """
+            Write K parameter sets to filename, as the generated latency
+            benchmark reads them: raw doubles, one problem_params_t after
+            another. Each value may have a leading batch dimension of K, as
+            in Canonicalize.assign_batch, or none to be shared by all sets.
+            Returns K
+        """
+
+        values = []
+        K = 1
+
+        for name, parameter in self.context['parameters'].items():
+
+            if name not in parameters:
+                raise(KeyError('Parameter named '+ name +' not supplied'))
+
+            value = np.asarray(parameters[name], dtype = float)
+            size  = parameter['size']
+
+            if value.size % size != 0:
+                raise(ShapeError('Parameter named ' + name + ' of ' +
+                        str(size) + ' elements got values of shape '
+                        + str(value.shape)))
+
+            values.append(value.reshape(-1, size))
+            K = max(K, len(values[-1]))
+
+        for value, name in zip(values, self.context['parameters']):
+            if len(value) not in [1, K]:
+                raise(ShapeError('Parameter named ' + name + ' has a batch '
+                        'of ' + str(len(value)) + ', expected 1 or ' + str(K)))
+
+        sets = np.concatenate([np.broadcast_to(value, (K, value.shape[1]))
+                                    for value in values], axis = 1)
+
+        sets.astype('<f8').tofile(str(filename))
+
+        return K
+
 class ParametricFunction:
     """ Object to encapsulate a function which needs to be represented
         natively (since all its arguments are parameters). """
@@ -0,0 +1,438 @@
+from cvx_sym.operations.functions import Function
+from cvx_sym.operations.atoms import sums, muls
+from cvx_sym.conventions import scalar_shape
+from cvx_sym.errors import ShapeError
+from cvx_sym import symbolic as sym
+import numpy as np
+import importlib
+
+def polynomial(expr):
+    """
+        Expand a symbolic matrix entry into a list of monomials,
+            [(coefficient, factors), ...]
+
+        where factors is a tuple of the Parameters (and parametric Functions)
+        which are multiplied together with the float coefficient.
+    """
+
+    if type(expr) is sym.Constant:
+        return [(expr.value, ())]
+
+    elif type(expr) in [float, int] or isinstance(expr, np.number):
+        return [(float(expr), ())]
+
+    elif type(expr) is sym.Parameter:
+        return [(1.0, (expr,))]
+
+    elif issubclass(type(expr), sums.sum):
+
+        terms = []
+        for arg in expr.args:
+            terms += polynomial(arg)
+
+        return terms
+
+    elif type(expr) is muls.smul:
+
+        # Distribute the product over the monomials of each argument
+        terms = [(1.0, ())]
+        for arg in expr.args:
+            terms = [(c0 * c1, f0 + f1) for c0, f0 in terms
+                                         for c1, f1 in polynomial(arg)]
+        return terms
+
+    elif issubclass(type(expr), Function):
+
+        if hasattr(expr, 'parametric') and expr.parametric:
+            return [(1.0, (expr,))]
+
+        raise(TypeError(str(expr) + ' non-parametric function '
+                                    'was found in a matrix'))
+
+    else:
+        raise(TypeError('No assignment category found for ' + str(expr)))
+
+def parameter_elements(expr):
+    """ The parameter elements which expr depends on, such as those in the
+        arguments of a parametric function, in order of first use """
+
+    if type(expr) is sym.Parameter:
+
+        if expr.shape == scalar_shape:
+            return [expr]
+
+        return list(expr)  # every element of a shaped parameter
+
+    elif type(expr) in [list, tuple]:
+        args = expr
+
+    elif hasattr(expr, 'args'):
+        args = expr.args
+
+    else:
+        return []
+
+    elements = {}  # id : element, in first order
+    for arg in args:
+        for element in parameter_elements(arg):
+            elements.setdefault(id(element), element)
+
+    return list(elements.values())
+
+def monomial(coeff, factors):
+    """ Symbolic form of coeff times the product of factors """
+
+    expr = None
+    for factor in factors:
+        expr = factor if expr is None else muls.smul(expr, factor,
+                                                     simple = True)
+    if expr is None:
+        return sym.Constant(coeff)
+
+    elif coeff == 1:
+        return expr
+
+    return muls.smul(sym.Constant(coeff), expr, simple = True)
+
+def normalize(expr):
+    """
+        Fold the numeric constants of a symbolic matrix entry, merge its
+        like terms (the same product of parameter elements and parametric
+        functions) and drop the terms which come to zero.
+
+        Returns a Constant, one monomial, or a sum of monomials with the
+        constant first. Expressions which are not polynomials (say a
+        non-parametric function) are returned as they are
+    """
+
+    try:
+        terms = polynomial(expr)
+    except TypeError:
+        return expr
+
+    return from_terms(terms)
+
+def from_terms(terms):
+    """ Normalized symbolic form of a list of monomials, as normalize """
+
+    merged = {}  # ids of factors : (coefficient, factors), in first order
+    for coeff, factors in terms:
+
+        key = tuple(sorted(id(f) for f in factors))
+
+        if key in merged:
+            merged[key] = (merged[key][0] + coeff, merged[key][1])
+        else:
+            merged[key] = (coeff, factors)
+
+    constant = merged.pop((), (0.0, ()))[0]
+
+    monomials = [monomial(coeff, factors)
+                    for coeff, factors in merged.values() if coeff != 0]
+
+    if constant != 0 or len(monomials) == 0:
+        monomials = [sym.Constant(constant)] + monomials
+
+    return sums.sum(*monomials, simple = True)
+
+class ParameterMapping:
+    """
+        Compiled form of the symbolic canonical matrices, which maps parameter
+        values onto numeric problem data without touching the symbols.
+
+        Every entry of c, h, b and the CSC values of G and A is a polynomial
+        in the parameter elements. The entries are stored as one sparse
+        mapping (COO, sorted by entry) onto a vector of factors
+
+            x = [1, theta, parametric function values, products of these]
+
+        so that the data for new parameters is a gather, a multiply and a
+        segmented sum:  data[i] = sum of vals * x[cols] over the row of i
+    """
+
+    def __init__(self, canon):
+
+        # Where each matrix lives within the concatenated data vector
+        self.matrices = {'c' : canon.c,
+                         'h' : canon.h,
+                         'G' : canon.G.A if canon.G is not None else None,
+                         'b' : canon.b,
+                         'A' : canon.A.A if canon.A is not None else None}
+
+        self.slices = {}
+
+        self.slots     = {}  # leaf parameter name : index into theta
+        self.functions = []  # parametric functions, in order of slot
+        self.products  = {}  # tuple of factor slots : product slot
+
+        rows, cols, vals = [], [], []
+
+        entry = 0
+        for name, values in self.matrices.items():
+
+            if values is None:
+                self.slices[name] = None
+                continue
+
+            start = entry
+            for value in values:
+
+                for coeff, factors in polynomial(value) or [(0.0, ())]:
+
+                    rows.append(entry)
+                    cols.append(self.factor_slots(factors))
+                    vals.append(coeff)
+
+                entry += 1
+
+            self.slices[name] = slice(start, entry)
+
+        self.size = entry
+
+        # Function and product slots are appended after [1, theta]
+        ntheta = len(self.slots)
+        nfuncs = len(self.functions)
+
+        self.nfactors = 1 + ntheta + nfuncs + len(self.products)
+
+        self.cols = np.array([self.offset_slot(c, ntheta) for c in cols],
+                             dtype = np.intp)
+        self.vals = np.array(vals, dtype = float)
+        self.rows = np.array(rows, dtype = np.intp)
+
+        # Every entry has at least one term, so the first term of each entry
+        # marks the start of its segment for np.add.reduceat
+        self.starts = np.flatnonzero(np.diff(self.rows, prepend = -1))
+
+        # With scipy, the same mapping as a sparse matrix (data = x @ M.T)
+        if importlib.util.find_spec("scipy"):
+            import scipy.sparse
+
+            self.matrix = scipy.sparse.csr_matrix(
+                            (self.vals, (self.rows, self.cols)),
+                            shape = (self.size, self.nfactors))
+        else:
+            self.matrix = None
+
+        # Group the products by degree, so each degree is a single gather
+        self.degrees = {}
+        for factors, slot in self.products.items():
+
+            slot    = self.offset_slot(slot, ntheta)
+            factors = [self.offset_slot(f, ntheta) for f in factors]
+
+            self.degrees.setdefault(len(factors), []).append((slot, factors))
+
+        for d, items in self.degrees.items():
+            self.degrees[d] = (np.array([i[0] for i in items], dtype=np.intp),
+                               np.array([i[1] for i in items], dtype=np.intp))
+
+        # Parent parameters, to scatter whole arrays into theta at once.
+        # For each, the (flat, row major) positions of the elements in use,
+        # and the slots in theta which those elements go into
+        self.parents = {}
+        self.shapes  = {}
+        for name, parm in canon.parms.items():
+
+            if parm.elements == {}:
+                continue
+
+            index = np.full(parm.shape, -1, dtype = np.intp)
+            for (i, j), element in parm.elements.items():
+                index[i, j] = self.slots.get(element.name, -1)
+
+            used = np.flatnonzero(index >= 0)
+
+            if len(used) > 0:
+                self.parents[name] = (used, index.ravel()[used])
+                self.shapes[name]  = tuple(parm.shape)
+
+    def factor_slots(self, factors):
+        """ Return the (provisional) slot of the product of factors.
+            Parameter slots are ('p', n), function slots ('f', n), and
+            product slots ('x', n), which are offset once all are known """
+
+        slots = []
+        for factor in factors:
+
+            if type(factor) is sym.Parameter:
+
+                if factor.name not in self.slots:
+                    self.slots[factor.name] = len(self.slots)
+
+                slots.append(('p', self.slots[factor.name]))
+
+            else:
+
+                for n, function in enumerate(self.functions):
+                    if function is factor:
+                        break
+                else:
+                    n = len(self.functions)
+                    self.functions.append(factor)
+
+                    # The function is evaluated on the elements of its
+                    # arguments, which need slots in theta to be supplied
+                    for element in parameter_elements(factor):
+                        if element.name not in self.slots:
+                            self.slots[element.name] = len(self.slots)
+
+                slots.append(('f', n))
+
+        if len(slots) == 0:
+            return ('1', 0)
+
+        elif len(slots) == 1:
+            return slots[0]
+
+        slots = tuple(sorted(slots))
+
+        if slots not in self.products:
+            self.products[slots] = ('x', len(self.products))
+
+        return self.products[slots]
+
+    def offset_slot(self, slot, ntheta):
+        """ Final index into x of a provisional slot """
+
+        kind, n = slot
+
+        if kind == '1':
+            return 0
+        elif kind == 'p':
+            return 1 + n
+        elif kind == 'f':
+            return 1 + ntheta + n
+        else:
+            return 1 + ntheta + len(self.functions) + n
+
+    def theta(self, parameters):
+        """
+            Matrix (K, len(theta)) of the values of every parameter element in
+            use, for K parameter sets. Each value may be given with a leading
+            batch dimension of K, or without one to be shared by all K sets.
+        """
+
+        values = {}
+        K = 1
+
+        for name, value in parameters.items():
+
+            if name in self.parents:
+                shape = self.shapes[name]
+            elif name in self.slots:
+                shape = ()
+            else:
+                continue
+
+            value = np.asarray(value, dtype = float)
+            size  = int(np.prod(shape))
+
+            if value.size % size != 0:
+                raise(ShapeError('Parameter named ' + name + ' with shape '
+                        + str(shape) + ' got values of shape '
+                        + str(value.shape)))
+
+            values[name] = value.reshape((value.size // size,) + shape)
+            K = max(K, len(values[name]))
+
+        theta    = np.zeros((K, len(self.slots)))
+        supplied = np.zeros(len(self.slots), dtype = bool)
+
+        for name, value in values.items():
+
+            if len(value) not in [1, K]:
+                raise(ShapeError('Parameter named ' + name + ' has a batch '
+                        'of ' + str(len(value)) + ', expected 1 or ' + str(K)))
+
+            if name in self.parents:
+
+                used, slots = self.parents[name]
+
+                theta[:, slots] = value.reshape(len(value), -1)[:, used]
+                supplied[slots] = True
+
+            else:
+
+                theta[:, self.slots[name]] = value
+                supplied[self.slots[name]] = True
+
+        if not supplied.all():
+            name = list(self.slots)[np.argmin(supplied)]
+            raise(KeyError('Parameter named '+ name +' not supplied'))
+
+        return theta
+
+    def factors(self, theta):
+        """ Matrix x (K, nfactors) of factors which the mapping multiplies
+            into the data, one row for each row of theta """
+
+        K, ntheta = theta.shape
+
+        x = np.empty((K, self.nfactors))
+        x[:, 0] = 1.0
+        x[:, 1:1 + ntheta] = theta
+
+        if self.functions:
+            for k in range(K):
+
+                elements = dict(zip(self.slots, theta[k]))
+
+                for n, function in enumerate(self.functions):
+                    x[k, 1 + ntheta + n] = function.value(elements)
+
+        for d, (slots, factors) in self.degrees.items():
+            x[:, slots] = x[:, factors].prod(axis = -1)
+
+        return x
+
+    def evaluate_batch(self, parameters, chunk = 4096, out = None):
+        """
+            Numeric problem data for K parameter sets at once, as a dict of
+            2-D arrays (K, length) 'c', 'h', 'b' and the CSC values of 'G' and
+            'A'. All K sets share the sparsity pattern of the canonical G, A.
+
+            The sets are evaluated in chunks, to bound intermediate memory.
+            If given, out is a (K, self.size) array to write the data into,
+            and the returned arrays are views of it
+        """
+
+        theta = self.theta(parameters)
+        K     = len(theta)
+
+        if out is None:
+            data = np.zeros((K, self.size))
+
+        elif out.shape != (K, self.size):
+            raise(ShapeError('Output of shape ' + str(out.shape) + ' given '
+                    'for data of shape ' + str((K, self.size))))
+        else:
+            data = out
+
+        if self.size > 0:
+            for k in range(0, K, chunk):
+
+                x = self.factors(theta[k:k + chunk])
+
+                if self.matrix is not None:
+                    data[k:k + chunk] = x @ self.matrix.T
+                else:
+                    data[k:k + chunk] = np.add.reduceat(
+                                            self.vals * x[:, self.cols],
+                                            self.starts, axis = 1)
+
+        return { name : (data[:, where] if where is not None else None)
+                            for name, where in self.slices.items() }
+
+    def evaluate(self, parameters):
+        """ Numeric problem data for the given parameter values, as a dict of
+            arrays 'c', 'h', 'b' and the CSC values of 'G' and 'A' """
+
+        data = self.evaluate_batch(parameters)
+
+        if len(data['c']) != 1:
+            raise(ShapeError('Got a batch of ' + str(len(data['c'])) +
+                    ' parameter sets, use evaluate_batch instead'))
+
+        return { name : (values[0] if values is not None else None)
+                            for name, values in data.items() }
@@ -1,6 +1,7 @@
 from cvx_sym.conventions import scalar_shape
 from cvx_sym.operations.atoms import sums
 from cvx_sym.errors import ShapeError
+from cvx_sym import symbolic as sym
 
 class Minimize(sums.sum):
 
@@ -20,6 +21,46 @@ class Problem:
         self.objective   = objective
         self.constraints = constraints
 
+        # Registry of the symbols of this problem, see sym.SymbolRegistry
+        self.registry = self.find_registry()
+
+    def find_registry(self):
+        """ The one registry which the symbols of the problem belong to,
+            or the current registry if the problem holds no symbols """
+
+        registries = {}  # id : registry, in order found
+        stack = [self.objective, self.constraints]
+        seen  = set()    # ids of the subexpressions already walked
+
+        while stack:
+            item = stack.pop()
+
+            if id(item) in seen:
+                continue
+            seen.add(id(item))
+
+            if isinstance(item, sym.Symbol):
+                registries.setdefault(id(item.registry), item.registry)
+
+            elif type(item) in [list, tuple]:
+                stack += item
+
+            elif hasattr(item, 'expr'):  # constraints
+                stack.append(item.expr)
+
+            elif hasattr(item, 'args'):
+                stack += item.args
+
+        if len(registries) > 1:
+            raise(ValueError('Problem holds symbols of ' +
+                    str(len(registries)) + ' registries, build all of its '
+                    'symbols inside the same SymbolRegistry'))
+
+        elif registries:
+            return list(registries.values())[0]
+
+        return sym.current()
+
     def __str__(self):
 
         endl = '\n'
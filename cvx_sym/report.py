@@ -0,0 +1,184 @@
+import tracemalloc
+import threading
+import json
+
+from contextlib import contextmanager
+from time import perf_counter
+
+""" Tracing is process wide, and shared by the stages measured at the same
+    time (say, in threads) through the counts below. It is stopped once the
+    last of those stages ends, if a stage started it. A stage which overlaps
+    another cannot tell their allocations apart, so its peak is None. So is
+    the peak of a stage which finds tracing on before Python 3.9, which has
+    no tracemalloc.reset_peak to start its peak from.
+"""
+
+_tracing = {'lock'    : threading.Lock(),
+            'active'  : 0,      # stages being traced now
+            'started' : False,  # whether a stage started tracemalloc
+            'shared'  : False}  # whether the active stages have overlapped
+
+def _trace_begin():
+    """ Begin tracing a stage. Returns the traced memory at its start,
+        for _trace_end """
+
+    with _tracing['lock']:
+
+        if _tracing['active'] == 0:
+
+            _tracing['shared'] = False
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing['started'] = True
+
+            elif not hasattr(tracemalloc, 'reset_peak'):
+                _tracing['shared'] = True  # the peak may predate the stage
+        else:
+            _tracing['shared'] = True
+
+        _tracing['active'] += 1
+
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+        return tracemalloc.get_traced_memory()[0]
+
+def _trace_end(start):
+    """ End tracing the stage which began with _trace_begin. Returns its
+        peak, or None if it overlapped another stage """
+
+    with _tracing['lock']:
+
+        peak   = tracemalloc.get_traced_memory()[1] - start
+        shared = _tracing['shared']
+
+        _tracing['active'] -= 1
+
+        if _tracing['active'] == 0 and _tracing['started']:
+            tracemalloc.stop()
+            _tracing['started'] = False
+
+    return None if (shared or peak < 0) else peak
+
+@contextmanager
+def unmeasured():
+    """ Context which measures nothing, in place of a stage of no report """
+    yield
+
+class StageReport:
+    """
+        Wall time, peak memory and object counts of each stage of a process,
+        such as the stages of Canonicalize. Each stage is a dict:
+
+            'stage'   : name of the stage
+            'seconds' : wall time spent in the stage
+            'peak'    : peak bytes allocated above the start of the stage,
+                        by tracemalloc (None if memory is not traced, or
+                        if the stage overlapped another)
+            'counts'  : { name : count } of objects after the stage
+
+        memory : trace allocations for the peaks, which slows stages down.
+                 The peak of a stage which overlaps another (in another
+                 thread, or nested) is None, see _tracing
+        jsonl  : path or file to append each stage to, as a line of JSON
+    """
+
+    def __init__(self, memory = True, jsonl = None):
+
+        self.memory = memory
+        self.jsonl  = jsonl
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, counts = None):
+        """ Measure the stage run inside this context. counts, if given, is
+            called at the end of the stage for its { name : count } """
+
+        if self.memory:
+            start = _trace_begin()
+
+        begin = perf_counter()
+
+        try:
+            yield
+
+        finally:
+            seconds = perf_counter() - begin
+
+            peak = _trace_end(start) if self.memory else None
+
+            record = {'stage'   : name,
+                      'seconds' : seconds,
+                      'peak'    : peak,
+                      'counts'  : counts() if counts is not None else {}}
+
+            self.stages.append(record)
+            self.write(record)
+
+    def write(self, record):
+        """ Append record to self.jsonl, if any, as a line of JSON """
+
+        if self.jsonl is None:
+            return
+
+        line = json.dumps(record) + '\n'
+
+        if hasattr(self.jsonl, 'write'):
+            self.jsonl.write(line)
+        else:
+            with open(self.jsonl, 'a') as f:
+                f.write(line)
+
+    def __getitem__(self, name):
+        """ The (last) stage with the given name """
+
+        for record in reversed(self.stages):
+            if record['stage'] == name:
+                return record
+
+        raise(KeyError('No stage named ' + str(name)))
+
+    def __iter__(self):
+        return iter(self.stages)
+
+    def __len__(self):
+        return len(self.stages)
+
+    @property
+    def seconds(self):
+        """ Total wall time of the stages """
+        return sum(record['seconds'] for record in self.stages)
+
+    @property
+    def peak(self):
+        """ Largest peak of the stages, None if memory is not traced """
+
+        peaks = [record['peak'] for record in self.stages
+                                    if record['peak'] is not None]
+
+        return max(peaks) if peaks else None
+
+    def json_lines(self):
+        """ The stages as lines of JSON """
+        return ''.join(json.dumps(record) + '\n' for record in self.stages)
+
+    def __str__(self):
+
+        string = '%-14s %10s %12s  %s' % ('stage', 'ms', 'peak KiB', 'counts')
+
+        for record in self.stages:
+
+            peak = record['peak']
+            peak = '%12.1f' % (peak / 1024) if peak is not None else '%12s' % '-'
+
+            counts = ', '.join(str(k) + ' ' + str(v)
+                                for k, v in record['counts'].items())
+
+            string += '\n%-14s %10.2f %s  %s' % (record['stage'],
+                                                 record['seconds'] * 1e3,
+                                                 peak, counts)
+        return string
+
+    def __repr__(self):
+        return 'StageReport of ' + str(len(self.stages)) + ' stages'
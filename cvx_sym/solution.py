@@ -1,6 +1,9 @@
 import importlib
+import sys
 import numpy as np
 
+from time import perf_counter
+
 def solve(canon, verbose = False, fail_return = True):
 
     if importlib.util.find_spec("ecos"):
@@ -10,15 +13,289 @@ def solve(canon, verbose = False, fail_return = True):
         print("WARNING: Module 'ecos' not found - can not solve")
         return None
 
-    G = scipy.sparse.csc_matrix(*canon.G.to_scipy())
-    c = np.array(canon.c)
-    h = np.array(canon.h)
+    # Numeric data comes from Canonicalize.assign_values
+    if canon.data is None:
+        canon.assign_values({})
+
+    data = canon.data
+
+    G = scipy.sparse.csc_matrix((data['G'], canon.G.JA, canon.G.IA),
+                                canon.G.shape)
+    c = data['c']
+    h = data['h']
 
     if canon.A is not None:
-        A = scipy.sparse.csc_matrix(*canon.A.to_scipy())
-        b = np.array(canon.b)
+        A = scipy.sparse.csc_matrix((data['A'], canon.A.JA, canon.A.IA),
+                                    canon.A.shape)
+        b = data['b']
     else:
         A = None
         b = None
 
     return ecos.solve(c, G, h, canon.dims, A, b, verbose=verbose)
+
+class Solver:
+    """
+        Reusable handle for solving one canonicalized problem many times.
+
+        The sparsity structure (IA, JA) of G and A and the cone dimensions are
+        fixed on creation. Each solve only evaluates the parameter mapping
+        and swaps the new values into the cached scipy matrices.
+    """
+
+    def __init__(self, canon, verbose = False):
+
+        if importlib.util.find_spec("ecos"):
+            import ecos
+            import scipy.sparse  # assumed that if you have ecos, you have scipy
+        else:
+            raise(ImportError("Module 'ecos' not found - can not solve"))
+
+        self.ecos    = ecos
+        self.canon   = canon
+        self.dims    = canon.dims
+        self.verbose = verbose
+        self.mapping = canon.compile()
+
+        def csc(matrix):
+            return scipy.sparse.csc_matrix(
+                                (np.zeros(len(matrix.A)), matrix.JA, matrix.IA),
+                                matrix.shape)
+
+        self.G = csc(canon.G)
+        self.A = csc(canon.A) if canon.A is not None else None
+
+        # For each variable, where its elements sit in the solution vector
+        columns = { id(v):m for m, v in enumerate(canon.vars.values()) }
+
+        self.unpacking = {}
+        for name, var in canon.variables.items():
+
+            if var.elements == {}:  # scalar
+                elements = {(0, 0) : var}
+            else:
+                elements = var.elements
+
+            where = [ (i * var.shape[1] + j, columns[id(v)])
+                        for (i, j), v in elements.items() if id(v) in columns ]
+
+            self.unpacking[name] = (var.shape,
+                                    np.array([w[0] for w in where], dtype=int),
+                                    np.array([w[1] for w in where], dtype=int))
+
+    def update(self, parameters):
+        """ Evaluate the problem data for parameters, in place """
+
+        self.data = self.mapping.evaluate(parameters)
+
+        self.G.data[:] = self.data['G']
+
+        if self.A is not None:
+            self.A.data[:] = self.data['A']
+
+    def variables(self, x):
+        """ Map a solution vector x back onto arrays of each variable's shape.
+            Elements which do not appear in the problem are nan.
+
+            x may have leading (batch) dimensions, which are kept """
+
+        x    = np.asarray(x)
+        lead = x.shape[:-1]
+
+        variables = {}
+        for name, (shape, flat, columns) in self.unpacking.items():
+
+            value = np.full(lead + (shape[0] * shape[1],), np.nan)
+            value[..., flat] = x[..., columns]
+
+            variables[name] = value.reshape(lead + tuple(shape))
+
+        return variables
+
+    def solve(self, parameters, **options):
+        """ Solve for the given parameter values. Returns what ecos.solve(...)
+            returns, plus 'variables' : { name : array of variable shape } """
+
+        self.update(parameters)
+
+        solution = self.ecos.solve(self.data['c'], self.G, self.data['h'],
+                                   self.dims, self.A, self.data['b'],
+                                   verbose = self.verbose, **options)
+
+        solution['variables'] = self.variables(solution['x'])
+
+        return solution
+
+""" Batch solving over a process pool.
+
+    The canonical structure (index arrays, dims, layout of the data) is
+    shipped to each worker once, through the pool initializer. The problem
+    data of every instance is written into one block of shared memory,
+    and workers write their solutions into another, so that per-instance
+    traffic between processes is only the range of instances to solve.
+"""
+
+_worker = {}  # state of a batch worker process, set by _batch_init
+
+def _batch_init(structure, data_name, out_name, K):
+
+    import ecos
+    import scipy.sparse
+    from multiprocessing import shared_memory
+
+    _worker['ecos'] = ecos
+    _worker['structure'] = structure
+
+    _worker['data_shm'] = shared_memory.SharedMemory(name = data_name)
+    _worker['out_shm']  = shared_memory.SharedMemory(name = out_name)
+
+    _worker['data'] = np.ndarray((K, structure['size']), dtype = float,
+                                 buffer = _worker['data_shm'].buf)
+    _worker['out']  = np.ndarray((K, structure['width']), dtype = float,
+                                 buffer = _worker['out_shm'].buf)
+
+    def csc(name):
+        if structure[name] is None:
+            return None
+
+        JA, IA, shape = structure[name]
+        return scipy.sparse.csc_matrix((np.zeros(len(JA)), JA, IA), shape)
+
+    _worker['G'] = csc('G')
+    _worker['A'] = csc('A')
+
+def _batch_solve(start, stop, options):
+
+    ecos      = _worker['ecos']
+    structure = _worker['structure']
+    slices    = structure['slices']
+    columns   = structure['columns']
+
+    G, A = _worker['G'], _worker['A']
+
+    for k in range(start, stop):
+
+        data = _worker['data'][k]
+        out  = _worker['out'][k]
+
+        G.data[:] = data[slices['G']]
+
+        if A is not None:
+            A.data[:] = data[slices['A']]
+            b = data[slices['b']]
+        else:
+            b = None
+
+        begin = perf_counter()
+
+        solution = ecos.solve(data[slices['c']], G, data[slices['h']],
+                              structure['dims'], A, b, **options)
+
+        out[columns['time']]   = perf_counter() - begin
+        out[columns['status']] = solution['info']['exitFlag']
+
+        for name in ['x', 'y', 'z', 's']:
+            out[columns[name]] = solution[name]
+
+    return stop - start
+
+def solve_batch(canon, parameters, workers = None, chunk = None, **options):
+    """
+        Solve K parameter sets (arrays with a leading batch dimension, as in
+        Canonicalize.assign_batch) across a pool of worker processes.
+
+        Returns a dict of arrays stacked in input order:
+            'x', 'y', 'z', 's' : (K, length) ecos solution vectors
+            'status'           : (K,) ecos exit flag of each instance
+            'time'             : (K,) seconds spent solving each instance
+            'variables'        : { name : (K,) + shape of the variable }
+
+        Needs Python 3.8+, for multiprocessing.shared_memory
+    """
+
+    if sys.version_info < (3, 8):
+        raise(ImportError('solve_batch needs Python 3.8+, for '
+                          'multiprocessing.shared_memory'))
+
+    if not importlib.util.find_spec("ecos"):
+        print("WARNING: Module 'ecos' not found - can not solve")
+        return None
+
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+    import os
+
+    options.setdefault('verbose', False)
+
+    solver  = Solver(canon)
+    mapping = solver.mapping
+
+    n = len(canon.vars)
+    m = len(canon.h)
+    p = len(canon.b) if canon.A is not None else 0
+
+    # Layout of each instance's row in the output block
+    columns = {}
+    width   = 0
+    for name, length in [('x', n), ('y', p), ('z', m), ('s', m)]:
+        columns[name] = slice(width, width + length)
+        width += length
+
+    columns['status'] = width
+    columns['time']   = width + 1
+    width += 2
+
+    structure = {
+        'G'       : (canon.G.JA, canon.G.IA, canon.G.shape),
+        'A'       : ((canon.A.JA, canon.A.IA, canon.A.shape)
+                                    if canon.A is not None else None),
+        'dims'    : canon.dims,
+        'slices'  : mapping.slices,
+        'size'    : mapping.size,
+        'width'   : width,
+        'columns' : columns,
+    }
+
+    K = len(mapping.theta(parameters))
+
+    data_shm = shared_memory.SharedMemory(create = True,
+                                          size = max(1, K * mapping.size * 8))
+    out_shm  = shared_memory.SharedMemory(create = True,
+                                          size = max(1, K * width * 8))
+
+    data = np.ndarray((K, mapping.size), dtype = float, buffer = data_shm.buf)
+    out  = np.ndarray((K, width), dtype = float, buffer = out_shm.buf)
+
+    try:
+        mapping.evaluate_batch(parameters, out = data)
+
+        workers = workers or os.cpu_count()
+        chunk   = chunk or max(1, K // (4 * workers))
+
+        with ProcessPoolExecutor(max_workers = workers,
+                                 initializer = _batch_init,
+                                 initargs = (structure, data_shm.name,
+                                             out_shm.name, K)) as pool:
+
+            futures = [ pool.submit(_batch_solve, start,
+                                    min(start + chunk, K), options)
+                            for start in range(0, K, chunk) ]
+
+            for future in futures:
+                future.result()  # raise any errors from the workers
+
+        results = { name : out[:, columns[name]].copy()
+                            for name in ['x', 'y', 'z', 's', 'time'] }
+
+        results['status'] = out[:, columns['status']].astype(int)
+
+    finally:
+        del data, out  # release the buffers before closing
+        data_shm.close()
+        data_shm.unlink()
+        out_shm.close()
+        out_shm.unlink()
+
+    results['variables'] = solver.variables(results['x'])
+
+    return results
@@ -1,4 +1,5 @@
 from cvx_sym.utilities import list_pprint
+import numpy as np
 
 class COO_to_CS:
 
@@ -53,22 +54,23 @@ class COO_to_CS:
         # ------------------ Sort values and their columns by row index
         # ------------------ (row major order)
 
-        self.A     = [x for n, x in sorted(zip(COO[major], COO['val']),
-                                            key = lambda pair: pair[0])]
+        # One stable sort of the major indices orders both the values and
+        # their minor indices, keeping insertion order within each major.
+        # Values are gathered as a list, since they may be symbolic objects
 
-        maj_min = [(n, x) for n, x in sorted(zip(COO[major], COO[minor]),
-                                            key = lambda pair: pair[0])]
+        majs = np.asarray(COO[major], dtype = np.intp)
+        mins = np.asarray(COO[minor], dtype = np.intp)
 
-        majs = [x[0] for x in maj_min]
-        mins = [x[1] for x in maj_min]
+        order = np.argsort(majs, kind = 'stable')
 
-        self.JA = mins
-        self.IA = [0]
+        self.A  = [COO['val'][n] for n in order]
+        self.JA = mins[order]
 
-        for i in  range(self.shape[['row','col'].index(major)]):
+        # Count the entries in each major, then accumulate them into IA
 
-            val_idxs_in_maj = [n for n, r in enumerate(majs) if r == i]
-            self.IA.append( self.IA[-1] + len(val_idxs_in_maj)  )
+        counts  = np.bincount(majs, minlength = self.shape[
+                                            ['row','col'].index(major)])
+        self.IA = np.concatenate(([0], np.cumsum(counts))).astype(np.intp)
 
     def __str__(self):
 
@@ -91,8 +93,8 @@ class COO_to_CS:
             if (other.form == self.form and
                 other.shape == self.shape and
                 self.A == other.A and
-                self.IA == other.IA and
-                self.JA == other.JA):
+                np.array_equal(self.IA, other.IA) and
+                np.array_equal(self.JA, other.JA)):
                 return True
 
         return False
@@ -102,3 +104,124 @@ class COO_to_CS:
             the initializer of a scipy.sparse.csc/csr_matrix """
 
         return (self.A, self.JA, self.IA), self.shape
+
+def column_adjacency(n, groups):
+    """ Adjacency sets of n columns, where the columns in each group (say
+        those with an entry in one row) are all adjacent to each other """
+
+    adjacency = [set() for m in range(n)]
+
+    for group in groups:
+        for m in group:
+            adjacency[m].update(group)
+
+    for m in range(n):
+        adjacency[m].discard(m)
+
+    return adjacency
+
+def bandwidth(adjacency, order):
+    """ Largest distance, within order, between two adjacent columns """
+
+    position = { m:k for k, m in enumerate(order) }
+
+    return max([abs(position[m] - position[k])
+                    for m in range(len(adjacency)) for k in adjacency[m]],
+               default = 0)
+
+def breadth_first(adjacency, root, visited):
+    """ Levels of the columns reached from root, skipping those visited.
+        Neighbours are taken in order of increasing degree """
+
+    seen   = set([root])
+    levels = [[root]]
+
+    while True:
+
+        level = []
+        for m in levels[-1]:
+            for k in sorted(adjacency[m], key = lambda k: (len(adjacency[k]), k)):
+
+                if k not in seen and not visited[k]:
+                    seen.add(k)
+                    level.append(k)
+
+        if not level:
+            return levels
+
+        levels.append(level)
+
+def reverse_cuthill_mckee(adjacency):
+    """
+        Reverse Cuthill-McKee ordering of the columns, which keeps adjacent
+        columns close together (a small bandwidth).
+
+        Each connected component is ordered breadth first, starting from a
+        pseudo-peripheral column: one of least degree in the last level of
+        a breadth first search, repeated while that gets deeper.
+    """
+
+    n = len(adjacency)
+
+    visited = [False] * n
+    order   = []
+
+    for start in sorted(range(n), key = lambda m: (len(adjacency[m]), m)):
+
+        if visited[start]:
+            continue
+
+        levels = breadth_first(adjacency, start, visited)
+
+        while True:
+
+            root = min(levels[-1], key = lambda m: (len(adjacency[m]), m))
+            deeper = breadth_first(adjacency, root, visited)
+
+            if len(deeper) <= len(levels):
+                break
+
+            levels = deeper
+
+        for level in levels:
+            for m in level:
+                visited[m] = True
+                order.append(m)
+
+    return order[::-1]
+
+def minimum_degree(adjacency):
+    """
+        Minimum degree ordering of the columns: repeatedly take the column
+        with fewest neighbours, then join its neighbours to each other, as
+        eliminating it in a factorization would. Ties go to the lower column
+    """
+
+    import heapq
+
+    graph = [set(adjacent) for adjacent in adjacency]
+    heap  = [(len(adjacent), m) for m, adjacent in enumerate(graph)]
+    heapq.heapify(heap)
+
+    eliminated = [False] * len(graph)
+    order = []
+
+    while heap:
+
+        degree, m = heapq.heappop(heap)
+
+        if eliminated[m] or degree != len(graph[m]):
+            continue  # stale entry of the heap
+
+        eliminated[m] = True
+        order.append(m)
+
+        for k in graph[m]:
+
+            graph[k].discard(m)
+            graph[k].update(graph[m])
+            graph[k].discard(k)
+
+            heapq.heappush(heap, (len(graph[k]), k))
+
+    return order
@@ -2,41 +2,145 @@ from cvx_sym.conventions import shape_conform, scalar_shape, index_string
 from cvx_sym import operations as ops
 from cvx_sym import utilities as util
 from cvx_sym import constraints
+import threading
 import copy
 
-symbols = {}
-unnamed = -1
+class SymbolRegistry:
+    """
+        The symbols of a problem by name, and the counter which names the
+        unnamed ones ('sym0', 'sym1', ...).
 
-def get_name(desired):
-    global symbols, unnamed
+        Symbols join the registry which is current (in their thread) when
+        they are made, else the default registry of their thread. A registry
+        is made current as a context, so that the symbols of a problem are
+        kept apart from those of any other problem:
 
-    if desired in ['b','c','h']:
-        print("WARNING: Symbol named " + str(desired) + " conflicts with "
-                "canonical matrix name, renaming to " + str(desired) + '_')
+            with SymbolRegistry():
+                x = Variable((n), name = 'x')
+                ...
+                problem = Problem(objective, constraints)
 
-        desired = desired + '_'
+        A Problem keeps the registry which its symbols belong to, which
+        Canonicalize makes current again for its auxiliary variables, and
+        gathers the symbols of the problem from.
 
-    if desired == 'sym':
-        unnamed += 1
-        return 'sym' + str(unnamed)
+        Each thread has its own default registry, so that problems can be
+        built and canonicalized in separate threads. A thread which is
+        reused, as by a pool, keeps its default registry from one problem to
+        the next: build each problem in a registry of its own, or call
+        reset_symbols() once done with it. Naming is locked, so a registry
+        may also be shared between threads.
+    """
 
-    elif desired in symbols.keys():
-        raise(NameError("Symbol named " + str(desired) + " already exists"))
+    def __init__(self):
 
-    return desired
+        self.symbols = {}
+        self.unnamed = -1
+        self.lock    = threading.RLock()
 
-def reset_sym_counter():
-    global unnamed
-    unnamed = -1
+    def name(self, desired):
+        """ Name for a new symbol, given the desired name """
 
-def reset_symbols():
+        if desired in ['b','c','h']:
+            print("WARNING: Symbol named " + str(desired) + " conflicts with "
+                    "canonical matrix name, renaming to " + str(desired) + '_')
+
+            desired = desired + '_'
+
+        with self.lock:
+
+            if desired == 'sym':
+                self.unnamed += 1
+                return 'sym' + str(self.unnamed)
+
+            elif desired in self.symbols:
+                raise(NameError("Symbol named " + str(desired) +
+                                " already exists"))
+
+        return desired
+
+    def add(self, symbol, desired):
+        """ Name symbol after desired and keep it, in one step """
+
+        with self.lock:
+            symbol.name = self.name(desired)
+            self.symbols[symbol.name] = symbol
+
+    def remove(self, symbol):
+
+        with self.lock:
+            del self.symbols[symbol.name]
+
+    def reset(self):
+        """ Forget every symbol, and restart the counter """
+
+        with self.lock:
+            self.symbols.clear()
+            self.unnamed = -1
+
+    def items(self):
+        """ (name, symbol) pairs, as they are now """
+
+        with self.lock:
+            return list(self.symbols.items())
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __iter__(self):
+        return iter(self.symbols.values())
+
+    def __contains__(self, name):
+        return name in self.symbols
+
+    def __enter__(self):
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, *exception):
+        _local.stack.pop()
+
+    def __copy__(self):
+        return self  # copies of symbols stay in the registry of the original
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return 'SymbolRegistry of ' + str(len(self.symbols)) + ' symbols'
+
+default = SymbolRegistry()  # default registry of the main thread
 
-    global symbols, unnamed
+symbols = default.symbols  # its symbols, by name
 
-    for key in list(symbols.keys()):
-        del symbols[key]
+class _Local(threading.local):
+    """ The registries entered as contexts, and the default registry,
+        of each thread """
 
-    unnamed = -1
+    def __init__(self):
+
+        self.stack = []
+
+        if threading.current_thread() is threading.main_thread():
+            self.default = default
+        else:
+            self.default = SymbolRegistry()
+
+_local = _Local()
+
+def current():
+    """ Registry which new symbols join, in this thread """
+
+    return _local.stack[-1] if _local.stack else _local.default
+
+def get_name(desired):
+    return current().name(desired)
+
+def reset_sym_counter():
+    current().unnamed = -1
+
+def reset_symbols():
+    current().reset()
 
 class AtomicSymbol:
     """ Base defining all mathematical operations on symbols """
@@ -97,21 +201,28 @@ class Symbol(AtomicSymbol):
     # whether or not an instance of the symbol should be a solver variable
     is_var = True
 
-    def __init__(self, shape = (), name = 'sym', index = None):
+    def __init__(self, shape = (), name = 'sym', index = None,
+                                               registry = None):
+
+        # The registry this symbol (and each of its elements) belongs to
+        self.registry = registry if registry is not None else current()
 
         self.shape = shape_conform(shape)
         self.value = NotImplemented
-        self.name  = get_name(name)
         self.index = index
 
         # This COO sparse matrix holds elements within symbol
         self.matrix = {'row':[], 'col':[], 'val':[]}
 
+        # This dict indexes the same elements by (row, col), so that finding
+        # an element does not require a scan of the COO matrix
+        self.elements = {}
+
         # This string holds the shape as a string for use in templates
         self.shape_string = index_string(self.shape)
 
-        global symbols
-        symbols[self.name] = self
+        # Sets self.name, unique within the registry
+        self.registry.add(self, name)
 
     def __str__(self):
         return self.name
@@ -132,7 +243,7 @@ class Symbol(AtomicSymbol):
                 start = 0
 
             if (stop is None):
-                stop = self.shape[n]
+                stop = self.shape[0]
 
             if (step is None):
                 step = 1
@@ -176,15 +287,12 @@ class Symbol(AtomicSymbol):
 
                     return Vector(sliced)
 
+        index = (index[0], index[1])
+
         # We may have previously put the element into the matrix
         # Try to go find it and return it
-        for n, value in enumerate(self.matrix['val']):
-
-            i = self.matrix['row'][n]
-            j = self.matrix['col'][n]
-
-            if i == index[0] and j == index[1]:
-                return value
+        if index in self.elements:
+            return self.elements[index]
 
         else:
             # We have not previously put the element into the self.matrix
@@ -194,14 +302,16 @@ class Symbol(AtomicSymbol):
 
                 element_name  = self.name
                 element_name += index_string(index)
-                element = type(self)(name = element_name, index = index)
+                element = type(self)(name = element_name, index = index,
+                                     registry = self.registry)
 
                 self.matrix['row'].append(index[0])
                 self.matrix['col'].append(index[1])
                 self.matrix['val'].append(element)
 
-                # Then recurse to actually go grab that element
-                return self[index]
+                self.elements[index] = element
+
+                return element
 
             else:
                 raise(IndexError('Index '+ str(index) +
@@ -224,17 +334,29 @@ class Symbol(AtomicSymbol):
         # First build out the entire self.matrix, preserves naming of elements
         self.__iter__()
 
-        transpose = copy.deepcopy(self)
+        # Shallow copy, so the transpose shares its elements with self
+        transpose = copy.copy(self)
 
         # Swap rows and columns
-        transpose.matrix['row'], transpose.matrix['col'] = (
-        transpose.matrix['col'], transpose.matrix['row'])
+        transpose.matrix = {'row' : list(self.matrix['col']),
+                            'col' : list(self.matrix['row']),
+                            'val' : list(self.matrix['val'])}
+        transpose.index_elements()
 
         # Broadcast modified shape
         transpose.shape = (transpose.shape[1], transpose.shape[0])
 
         return transpose
 
+    def index_elements(self):
+        """ Rebuild self.elements from the COO self.matrix, for use after
+            the rows or columns of self.matrix have been reassigned """
+
+        self.elements = { (i, j) : value for i, j, value in
+                            zip(self.matrix['row'],
+                                self.matrix['col'],
+                                self.matrix['val']) }
+
 
     def is_var(self):
         return (True if type(self) is Variable else False)
@@ -247,8 +369,7 @@ class Symbol(AtomicSymbol):
         return 0  # affine
 
     def clean(self):
-        global symbols
-        del symbols[self.name]
+        self.registry.remove(self)
 
 class Variable(Symbol):
 
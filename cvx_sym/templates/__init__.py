@@ -3,6 +3,8 @@ template_files_of_set = {
                     'main.c',
                     'problem.h',
                     'problem.c',
+                    'benchmark.c',
+                    'latency.c',
                     'CMakeLists.txt',
                 ],
 
@@ -0,0 +1,304 @@
+"""
+    Benchmark how canonicalization and code generation scale with problem
+    size, for the shapes of the problems in tests/integrations.
+
+    For each size, every stage of Canonicalize and Generate is measured by
+    a StageReport (wall time and peak traced memory). The results can be
+    saved as baselines, which later runs are compared against: a stage
+    slower or larger than its baseline by more than the threshold is
+    flagged as a regression. Baselines depend on the machine, so they are
+    not committed: the first run on a machine, finding none, saves them.
+
+    The slope column is d log(time) / d log(nonzeros) between each size and
+    the one before it, about 1 for linear scaling, so that super-linear
+    blowups stand out before the sizes which they make slow.
+
+        python -m cvx_sym.tests.benchmarks.scaling             # compare
+        python -m cvx_sym.tests.benchmarks.scaling --save      # new baselines
+        python -m cvx_sym.tests.benchmarks.scaling control -t 0.5
+"""
+
+from cvx_sym.symbolic import reset_symbols
+from cvx_sym.report import StageReport
+
+import cvx_sym as cvx
+
+import contextlib
+import argparse
+import tempfile
+import pathlib
+import json
+import math
+import sys
+import io
+
+here      = pathlib.Path(__file__).parent
+baselines = here / 'baselines.json'
+
+def readme_example(m, n):
+
+    A = cvx.Parameter((m, n), name = 'A')
+    B = cvx.Parameter((m),    name = 'B')
+    x = cvx.Variable((n),     name = 'x')
+
+    objective = cvx.Minimize(cvx.sum_squares(A*x - B))
+    return cvx.Problem(objective, [0 <= x, x <= 1])
+
+def control(T, n = 8, m = 2):
+
+    x = cvx.Variable((n, T+1), name='x')
+    u = cvx.Variable((m, T), name='u')
+
+    x_0 = cvx.Parameter((n), name='x_0')
+    A = cvx.Parameter((n,n), name='A')
+    B = cvx.Parameter((n,m), name='B')
+
+    states = []
+    constraints  = [ x[:,T] == 0 ]
+    constraints += [ x[:,0] == x_0[:,0] ]
+
+    for t in range(T):
+
+        constraints += [ x[:,t+1] == A*x[:,t] + B*u[:,t] ]
+        constraints += [ cvx.norm(u[:,t], kind = 'inf') <= 1 ]
+
+        states.append(cvx.sum_squares(x[:,t+1]) + cvx.sum_squares(u[:,t]))
+
+    return cvx.Problem(cvx.Minimize(cvx.sum(states)), constraints)
+
+def polyhedradist(n, m, p):
+
+    x1 = cvx.Variable ((n,1),name='x1')
+    x2 = cvx.Variable ((n,1),name='x2')
+
+    A1 = cvx.Parameter((m,n),name='A1')
+    A2 = cvx.Parameter((p,n),name='A2')
+    B1 = cvx.Parameter((m,1),name='B1')
+    B2 = cvx.Parameter((p,1),name='B2')
+
+    objective = cvx.square(cvx.norm(x1 - x2))
+
+    constraints  = [ A1[i].T * x1 <= B1[i] for i in range(m) ]
+    constraints += [ A2[i].T * x2 <= B2[i] for i in range(p) ]
+
+    return cvx.Problem(cvx.Minimize(objective), constraints)
+
+def chebyshevcenter(n, m):
+
+    r = cvx.Variable((1,1),name='r')
+    x = cvx.Variable((n,1),name='x')
+
+    A = cvx.Parameter((m,n),name='A')
+    B = cvx.Parameter((m,1),name='B')
+
+    constraints  = [A[i,:].T * x + r * cvx.norm(A[i,:]) <= B[i]
+                        for i in range(m)]
+    constraints += [r >= 0]
+
+    return cvx.Problem(cvx.Minimize(-r), constraints)
+
+# Problem : (builder, sizes to sweep, as its arguments)
+problems = {
+    'readme_example'  : (readme_example,  [(10, 5), (20, 10), (30, 20)]),
+    'control'         : (control,         [(5,), (10,), (20,), (40,)]),
+    'polyhedradist'   : (polyhedradist,   [(2, 3, 3), (4, 8, 8),
+                                           (8, 16, 16), (16, 32, 32)]),
+    'chebyshevcenter' : (chebyshevcenter, [(2, 3), (4, 8), (8, 16),
+                                           (16, 32)]),
+}
+
+def measure(name, size, folder, memory = True):
+    """
+        Canonicalize and Generate problem name at size, into folder.
+        Returns { stage : {'seconds', 'peak'} } with the 'total' of all
+        stages, and the number of nonzeros of the canonical matrices
+    """
+
+    builder, sizes = problems[name]
+
+    problem = builder(*size)
+    report  = StageReport(memory = memory)
+
+    # Link the solver in place of copying it, as Generate would each time
+    solver = pathlib.Path(folder) / name / 'ecos'
+    if not solver.exists():
+        solver.parent.mkdir(parents = True)
+        solver.symlink_to(pathlib.Path(cvx.__file__).parent /
+                                                        '__solvers__/ecos')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        gen = cvx.Generate(problem, name = name, folder = folder,
+                                    report = report)
+
+    stages = { record['stage'] : {'seconds' : record['seconds'],
+                                  'peak'    : record['peak']}
+                    for record in report }
+
+    stages['total'] = {'seconds' : report.seconds, 'peak' : report.peak}
+
+    nonzeros = gen.canonical.counts()['nonzeros']
+
+    reset_symbols()
+
+    return stages, nonzeros
+
+def run(names, memory = True, repeat = 3):
+    """ Measure each size of the named problems, keeping the least time
+        and peak of each stage over repeat runs, to damp noise.
+        Returns { name : { size : {'stages', 'nonzeros'} } } """
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as folder:
+        for name in names:
+
+            results[name] = {}
+            for size in problems[name][1]:
+
+                runs = [measure(name, size, folder, memory)
+                            for n in range(repeat)]
+
+                stages, nonzeros = runs[0]
+
+                for stage, least in stages.items():
+                    for key in ['seconds', 'peak']:
+
+                        values = [r[0][stage][key] for r in runs
+                                    if r[0][stage][key] is not None]
+
+                        least[key] = min(values) if values else None
+
+                results[name][str(size)] = {'stages'   : stages,
+                                            'nonzeros' : nonzeros}
+    return results
+
+def regressions(results, baseline, threshold,
+                floor = {'seconds' : 1e-2, 'peak' : 64 * 1024}):
+    """
+        The stages which took more time or peak memory than their baseline
+        by more than a fraction threshold of it, as a list of
+            (name, size, stage, measure, baseline, now)
+
+        Differences under floor (seconds, bytes) are taken as noise
+    """
+
+    flagged = []
+
+    for name, sizes in results.items():
+        for size, result in sizes.items():
+
+            before = baseline.get(name, {}).get(size)
+            if before is None:
+                continue
+
+            for stage, now in result['stages'].items():
+                for key in ['seconds', 'peak']:
+
+                    old = before['stages'].get(stage, {}).get(key)
+                    new = now[key]
+
+                    if old is None or new is None:
+                        continue
+
+                    if new - old > max(threshold * old, floor[key]):
+                        flagged.append((name, size, stage, key, old, new))
+
+    return flagged
+
+def slopes(sizes):
+    """ d log(total time) / d log(nonzeros) between consecutive sizes,
+        None for the first size """
+
+    slope  = [None]
+    sizes  = list(sizes.values())
+
+    for last, now in zip(sizes[:-1], sizes[1:]):
+
+        t0, t1 = last['stages']['total']['seconds'], now['stages']['total']['seconds']
+        n0, n1 = last['nonzeros'], now['nonzeros']
+
+        if n1 > n0 and t0 > 0:
+            slope.append(math.log(t1 / t0) / math.log(n1 / n0))
+        else:
+            slope.append(None)
+
+    return slope
+
+def report(results):
+    """ Print a table of the results """
+
+    stages = ['smith_form', 'relax_form', 'graph_form', 'expand', 'stuff',
+              'presolve', 'generate', 'total']
+
+    print('%-16s %-12s %9s' % ('problem', 'size', 'nonzeros') +
+          ''.join('%12s' % stage[:11] for stage in stages) +
+          '%10s %6s' % ('peak MiB', 'slope'))
+
+    for name, sizes in results.items():
+        for (size, result), slope in zip(sizes.items(), slopes(sizes)):
+
+            times = ''.join('%12.1f' % (1e3 * result['stages'][s]['seconds'])
+                                if s in result['stages'] else '%12s' % '-'
+                                    for s in stages)
+
+            peak = result['stages']['total']['peak']
+            peak = '%10.2f' % (peak / 2**20) if peak is not None else '%10s' % '-'
+
+            slope = '%6.2f' % slope if slope is not None else '%6s' % '-'
+
+            print('%-16s %-12s %9d' % (name, size, result['nonzeros'])
+                    + times + peak + ' ' + slope)
+
+    print('(times in ms)')
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = 'Scaling benchmarks of '
+                                     'canonicalization and code generation')
+
+    parser.add_argument('problems', nargs = '*', default = list(problems),
+                        help = 'problems to run, of ' + str(list(problems)))
+    parser.add_argument('-s', '--save', action = 'store_true',
+                        help = 'save the results as the baselines')
+    parser.add_argument('-t', '--threshold', type = float, default = 0.25,
+                        help = 'fraction over a baseline to flag')
+    parser.add_argument('-b', '--baselines', default = str(baselines),
+                        help = 'file of baselines')
+    parser.add_argument('-r', '--repeat', type = int, default = 3,
+                        help = 'runs of each size, of which the least counts')
+    parser.add_argument('--no-memory', action = 'store_true',
+                        help = 'do not trace memory, which slows stages')
+
+    args = parser.parse_args(argv)
+
+    results = run(args.problems, memory = not args.no_memory,
+                  repeat = args.repeat)
+    report(results)
+
+    path = pathlib.Path(args.baselines)
+
+    # The first run on a machine has nothing to compare, and saves baselines
+    if args.save or not path.exists():
+
+        saved = json.loads(path.read_text()) if path.exists() else {}
+        saved.update(results)
+
+        path.write_text(json.dumps(saved, indent = 1, sort_keys = True))
+        print('Saved baselines to', path)
+
+        return 0
+
+    flagged = regressions(results, json.loads(path.read_text()),
+                          args.threshold)
+
+    for name, size, stage, key, old, new in flagged:
+        print('REGRESSION %s %s %s %s: %.4g -> %.4g (+%.0f%%)' % (name, size,
+                stage, key, old, new, 100 * (new - old) / old))
+
+    if not flagged:
+        print('No regressions beyond', args.threshold, 'of the baselines')
+
+    return 1 if flagged else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+    Benchmark element access of shaped symbols. Each of __iter__, T and
+    slicing should scale linearly with the number of elements (m * n), so the
+    time per element printed below should stay roughly flat as size grows.
+"""
+
+from cvx_sym.symbolic import Parameter, reset_symbols
+from time import perf_counter
+
+def time_symbol(m, n):
+
+    times = {}
+
+    A = Parameter((m, n), name = 'A')
+
+    start = perf_counter()
+    list(A)
+    times['iter'] = perf_counter() - start
+
+    start = perf_counter()
+    A.T
+    times['T'] = perf_counter() - start
+
+    start = perf_counter()
+    for i in range(m):
+        A[i,:]
+    times['slice'] = perf_counter() - start
+
+    reset_symbols()
+
+    return times
+
+def main(sizes = [(25, 25), (50, 50), (100, 100), (200, 150), (200, 300)]):
+
+    print('%12s %10s %14s %14s %14s' % ('shape', 'elements',
+                                    'iter us/el', 'T us/el', 'slice us/el'))
+
+    for m, n in sizes:
+
+        times = time_symbol(m, n)
+        elements = m * n
+
+        print('%12s %10d %14.3f %14.3f %14.3f' % (str((m, n)), elements,
+                                1e6 * times['iter'] / elements,
+                                1e6 * times['T'] / elements,
+                                1e6 * times['slice'] / elements))
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 
-from cvx_sym.sparse import COO_to_CS
+from cvx_sym.sparse import (COO_to_CS, column_adjacency, bandwidth,
+                            reverse_cuthill_mckee, minimum_degree)
 
 def test_CS_row():
 
@@ -13,8 +14,8 @@ def test_CS_row():
     print(CSR)
 
     assert(CSR.A == [10, 20, 30, 40, 50, 60, 70, 80])
-    assert(CSR.IA== [0, 2, 4, 7, 8])
-    assert(CSR.JA== [0, 1, 1, 3, 2, 3, 4, 5])
+    assert(list(CSR.IA) == [0, 2, 4, 7, 8])
+    assert(list(CSR.JA) == [0, 1, 1, 3, 2, 3, 4, 5])
 
 def test_CS_col():
 
@@ -31,5 +32,49 @@ def test_CS_col():
     print('   JA', CSC.JA)
 
     assert(CSC.A  == [10, 20, 30, 50, 40, 60, 70, 80])
-    assert(CSC.IA == [0, 1, 3, 4, 6, 7, 8])
-    assert(CSC.JA == [0, 0, 1, 2, 1, 2, 2, 3])
+    assert(list(CSC.IA) == [0, 1, 3, 4, 6, 7, 8])
+    assert(list(CSC.JA) == [0, 0, 1, 2, 1, 2, 2, 3])
+
+def test_CS_to_scipy():
+
+    import scipy.sparse
+    import numpy as np
+
+    # with empty columns, and symbolic (object) values
+    COOL = {'row':[ 2,  0,  1,  0],
+            'col':[ 3,  3,  0,  1],
+            'val':[ 'a', 'b', 'c', 'd' ]}
+
+    CSC  = COO_to_CS(COOL, (3,5), 'col')
+
+    assert(CSC.A  == ['c', 'd', 'a', 'b'])
+    assert(list(CSC.IA) == [0, 1, 2, 2, 4, 4])
+    assert(list(CSC.JA) == [1, 0, 2, 0])
+
+    COOL['val'] = [1.0, 2.0, 3.0, 4.0]
+    CSC  = COO_to_CS(COOL, (3,5), 'col')
+
+    dense = scipy.sparse.csc_matrix(*CSC.to_scipy()).toarray()
+
+    assert(np.array_equal(dense, [[0, 4, 0, 2, 0],
+                                  [3, 0, 0, 0, 0],
+                                  [0, 0, 0, 1, 0]]))
+
+def test_reverse_cuthill_mckee():
+
+    # a path 0 - 3 - 1 - 4 - 2, numbered out of order
+    adjacency = column_adjacency(5, [{0, 3}, {3, 1}, {1, 4}, {4, 2}])
+
+    assert(bandwidth(adjacency, range(5)) == 3)
+
+    order = reverse_cuthill_mckee(adjacency)
+
+    assert(order == [2, 4, 1, 3, 0])
+    assert(bandwidth(adjacency, order) == 1)
+
+def test_minimum_degree():
+
+    # a star around 0, whose leaves go first, until 0 and 3 tie
+    adjacency = column_adjacency(4, [{0, 1}, {0, 2}, {0, 3}])
+
+    assert(minimum_degree(adjacency) == [1, 2, 0, 3])
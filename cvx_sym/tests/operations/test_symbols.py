@@ -53,3 +53,111 @@ def test_const():
 
     v = Constant(0)
     assert(v.value == 0.0)
+
+def test_element_index():
+
+    A = Parameter((3,2), name = 'A')
+
+    a = A[2,1]
+
+    assert(a.name == 'A[2][1]')
+    assert(A[2,1] is a)
+    assert(A.elements[(2,1)] is a)
+    assert(len(A.matrix['val']) == 1)
+
+    elements = list(A)
+
+    assert(len(elements) == 6)
+    assert(len(A.elements) == 6)
+    assert(all([A.elements[(i,j)] is A[i,j]
+                    for i in range(3) for j in range(2)]))
+
+    reset_symbols()
+
+def test_element_index_transpose():
+
+    A = Parameter((3,2), name = 'A')
+    AT = A.T
+
+    assert(AT.shape == (2,3))
+    assert(A.shape == (3,2))
+
+    for i in range(3):
+        for j in range(2):
+            assert(AT[j,i] is A[i,j])
+
+    assert(AT.matrix['row'] == A.matrix['col'])
+    assert(AT.matrix['col'] == A.matrix['row'])
+
+    reset_symbols()
+
+def test_registry():
+
+    from cvx_sym import Problem, Minimize, Canonicalize, SymbolRegistry, norm
+
+    problems = []
+    for n in range(2):
+
+        with SymbolRegistry() as registry:
+
+            x = Variable((2,), name = 'x')
+            u = Variable(name = 'u')
+            A = Parameter((2,2), name = 'A')
+
+            problem = Problem(Minimize(norm(A*x) + u), [u >= 0])
+
+        assert(problem.registry is registry)
+        problems.append((problem, x))
+
+    # Same names, kept apart from each other and from the default registry
+    assert('x' not in symbols.keys())
+    assert(problems[0][0].registry.symbols['x'] is problems[0][1])
+    assert(problems[1][0].registry.symbols['x'] is problems[1][1])
+
+    # Elements made outside the context join their parent's registry
+    x = problems[0][1]
+    assert('x[1][0]' in x[1,0].registry)
+    assert(x[1,0].registry is problems[0][0].registry)
+
+    for problem, x in problems:
+
+        canon = Canonicalize(problem)
+
+        assert(all(s.registry is problem.registry
+                        for s in list(canon.vars.values()) +
+                                 list(canon.parms.values())))
+
+        assert(list(canon.variables) == ['x', 'u'])
+        assert(list(canon.parms)[0] == 'A' and len(canon.parms) == 5)
+
+    assert(len(symbols) == 0)
+
+def test_registry_of_problem():
+
+    from cvx_sym import Problem, Minimize, Canonicalize, SymbolRegistry, norm
+
+    # The problem is made after the context, yet keeps its symbols' registry
+    with SymbolRegistry() as registry:
+
+        x = Variable((2,), name = 'x')
+        A = Parameter((2,2), name = 'A')
+
+    problem = Problem(Minimize(norm(A*x)), [x >= 0])
+
+    assert(problem.registry is registry)
+
+    canon = Canonicalize(problem)
+
+    assert(list(canon.variables) == ['x'])
+    assert(list(canon.parms)[0] == 'A')
+
+    # Symbols of two registries cannot make up one problem
+    y = Variable((2,), name = 'y')
+
+    try:
+        Problem(Minimize(norm(A*x)), [y >= x])
+        assert(False)  # should have raised
+    except ValueError:
+        pass
+
+    reset_symbols()
@@ -459,6 +459,85 @@ def test_ecos_control():
 
     reset_symbols()
 
+def test_ecos_solver_reuse():
+
+    import importlib
+
+    x = cvx.Variable ((3,1),name='x')
+    F = cvx.Parameter((3,3),name='F')
+    g = cvx.Parameter((3,1),name='g')
+    L = cvx.Parameter((3,1),name='L')
+
+    objective = cvx.Minimize(cvx.square(cvx.norm( F*x - g )))
+    problem   = cvx.Problem(objective, [ L <= x ])
+
+    canon = Canonicalize(problem, verbose=True)
+
+    if importlib.util.find_spec("ecos"):
+
+        solver = cvx.Solver(canon)
+
+        F_set = np.array([[1,2,3],[4,5,6],[7,8,9]])
+
+        for L_set in [np.array([[1],[2],[3]]), np.array([[2],[3],[4]])]:
+
+            parameters = {'F' : F_set, 'g' : np.array([[1],[2],[3]]),
+                          'L' : L_set}
+
+            solution  = solver.solve(parameters)
+            x_solution = solution['variables']['x']
+
+            print('Solution   x:', x_solution)
+
+            assert( x_solution.shape == (3,1) )
+            assert( np.allclose(x_solution, L_set) )
+
+            # Agrees with the one-off solve
+            canon.assign_values(parameters)
+            assert( np.allclose(cvx.solve(canon)['x'], solution['x']) )
+
+    reset_symbols()
+
+def test_ecos_solve_batch():
+
+    import importlib
+
+    x = cvx.Variable ((3,1),name='x')
+    F = cvx.Parameter((3,3),name='F')
+    g = cvx.Parameter((3,1),name='g')
+    L = cvx.Parameter((3,1),name='L')
+
+    objective = cvx.Minimize(cvx.square(cvx.norm( F*x - g )))
+    problem   = cvx.Problem(objective, [ L <= x ])
+
+    canon = Canonicalize(problem, verbose=True)
+
+    if importlib.util.find_spec("ecos"):
+
+        K = 6
+        np.random.seed(1)
+
+        parameters = {'F' : np.random.randn(K, 3, 3),
+                      'g' : np.random.randn(K, 3, 1),
+                      'L' : np.random.randn(K, 3, 1)}
+
+        results = cvx.solve_batch(canon, parameters, workers = 2, chunk = 2)
+
+        assert( results['x'].shape == (K, len(canon.vars)) )
+        assert( results['variables']['x'].shape == (K, 3, 1) )
+        assert( list(results['status']) == [0] * K )
+        assert( all(results['time'] > 0) )
+
+        solver = cvx.Solver(canon)
+
+        for k in range(K):
+            solution = solver.solve({name : value[k]
+                                        for name, value in parameters.items()})
+
+            assert( np.allclose(results['x'][k], solution['x']) )
+
+    reset_symbols()
+
 def full_scale_ecos_control():
 
     """ Takes a long time to canonicalize, so don't run as routine test """
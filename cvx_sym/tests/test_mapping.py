@@ -0,0 +1,167 @@
+"""
+    Test the compiled ParameterMapping of the canonical matrices:
+        Minimize(square(norm(F*x - g))) with x >= L ; F, g, L parameters
+"""
+
+from cvx_sym.symbolic import reset_symbols
+from cvx_sym.canonicalize import Canonicalize
+from cvx_sym.mapping import polynomial
+
+import cvx_sym as cvx
+
+import numpy as np
+
+def least_squares():
+
+    x = cvx.Variable ((3,1),name='x')
+    F = cvx.Parameter((3,3),name='F')
+    g = cvx.Parameter((3,1),name='g')
+    L = cvx.Parameter((3,1),name='L')
+
+    objective = cvx.Minimize(cvx.square(cvx.norm( F*x - g )))
+    problem   = cvx.Problem(objective, [ L <= x ])
+
+    return Canonicalize(problem, presolve = False)
+
+def test_mapping_polynomial():
+
+    p0 = cvx.Parameter(name = 'p0')
+    p1 = cvx.Parameter(name = 'p1')
+
+    terms = polynomial((2 * p0 * p1) + (-1 * p0) + 3)
+
+    assert([c for c, f in terms] == [2.0, -1.0, 3.0])
+    assert([[p.name for p in f] for c, f in terms] == [['p0','p1'],['p0'],[]])
+
+    reset_symbols()
+
+def test_mapping_evaluate():
+
+    canon = least_squares()
+
+    G_symbolic = list(canon.G.A)
+
+    F = np.array([[1,2,3],[4,5,6],[7,8,9]])
+    g = np.array([[1],[2],[3]])
+    L = np.array([[1],[2],[3]])
+
+    data = canon.assign_values({'F' : F, 'g' : g, 'L' : L})
+
+    # Symbolic form is left intact
+    assert(all([a is b for a, b in zip(canon.G.A, G_symbolic)]))
+
+    assert(data['A'] is not None and data['b'] is not None)
+    assert(len(data['G']) == len(canon.G.A))
+    assert(len(data['h']) == len(canon.h))
+    assert(len(data['c']) == len(canon.c))
+
+    # -F appears within A, and -L within h
+    assert(all([np.isclose(data['A'], -f).any() for f in F.flatten()]))
+    assert(np.allclose(data['h'][0:3], -L.flatten()))
+
+    # A second assignment reuses the compiled mapping
+    mapping = canon.mapping
+    data2   = canon.assign_values({'F' : 2 * F, 'g' : g, 'L' : L})
+
+    assert(canon.mapping is mapping)
+    assert(all([np.isclose(data2['A'], -2 * f).any() for f in F.flatten()]))
+
+    reset_symbols()
+
+def test_mapping_elements_and_missing():
+
+    canon = least_squares()
+
+    F = np.arange(9.0).reshape(3,3)
+
+    parameters = {'F[%d][%d]' % (i, j) : F[i, j]
+                        for i in range(3) for j in range(3)}
+    parameters.update({'g' : np.ones(3), 'L' : np.zeros(3)})
+
+    by_element = canon.assign_values(parameters)
+    by_array   = canon.assign_values({'F' : F, 'g' : np.ones(3),
+                                      'L' : np.zeros(3)})
+
+    for name in ['c', 'h', 'b', 'G', 'A']:
+        assert(np.array_equal(by_element[name], by_array[name]))
+
+    try:
+        canon.assign_values({'F' : F, 'g' : np.ones(3)})
+        assert(False)  # should have raised
+    except KeyError as error:
+        assert('L' in str(error))
+
+    reset_symbols()
+
+def test_mapping_batch():
+
+    canon = least_squares()
+
+    K = 5
+    np.random.seed(1)
+
+    F = np.random.randn(K, 3, 3)
+    g = np.random.randn(K, 3)
+    L = np.zeros((3, 1))  # shared by all K sets
+
+    batch = canon.assign_batch({'F' : F, 'g' : g, 'L' : L}, chunk = 2)
+
+    assert(batch['G'].shape == (K, len(canon.G.A)))
+    assert(batch['A'].shape == (K, len(canon.A.A)))
+    assert(batch['h'].shape == (K, len(canon.h)))
+
+    for k in range(K):
+
+        single = canon.assign_values({'F' : F[k], 'g' : g[k], 'L' : L})
+
+        for name in ['c', 'h', 'b', 'G', 'A']:
+            assert(np.allclose(batch[name][k], single[name]))
+
+    # Without scipy, the mapping falls back to a segmented numpy sum
+    canon.mapping.matrix = None
+    fallback = canon.assign_batch({'F' : F, 'g' : g, 'L' : L})
+
+    for name in ['c', 'h', 'b', 'G', 'A']:
+        assert(np.allclose(batch[name], fallback[name]))
+
+    try:
+        canon.assign_batch({'F' : F, 'g' : g[:3], 'L' : L})
+        assert(False)  # should have raised
+    except cvx.errors.ShapeError:
+        pass
+
+    reset_symbols()
+
+def test_mapping_function_only_parameter():
+    """ A parameter which appears only inside a parametric function """
+
+    m, n = 4, 2
+
+    r = cvx.Variable ((1,1),name='r')
+    x = cvx.Variable ((n,1),name='x')
+    A = cvx.Parameter((m,n),name='A')
+    P = cvx.Parameter((m,n),name='P')
+    B = cvx.Parameter((m,1),name='B')
+
+    constraints  = [A[i,:].T * x + r * cvx.norm(P[i,:]) <= B[i]
+                        for i in range(m)]
+    constraints += [r >= 0]
+
+    canon = Canonicalize(cvx.Problem(cvx.Minimize(-r), constraints))
+
+    np.random.seed(2)
+    values = np.random.randn(m, n)
+
+    data = canon.assign_values({'A' : np.random.randn(m, n), 'P' : values,
+                                'B' : np.ones((m, 1))})
+
+    for i in range(m):
+        assert(np.isclose(abs(data['G']), np.linalg.norm(values[i])).any())
+
+    try:
+        canon.assign_values({'A' : np.ones((m, n)), 'B' : np.ones((m, 1))})
+        assert(False)  # should have raised
+    except KeyError as error:
+        assert('P' in str(error))
+
+    reset_symbols()
@@ -150,7 +150,7 @@ def test_matrix_sq2norm_sqcon():
     con = [v0 >= square(v1)]  # should become -v0 + square(v1) <= 0
 
     p = Problem(Minimize(obj), con)
-    c = Canonicalize(p, verbose=True)
+    c = Canonicalize(p, verbose=True, presolve=False)
 
     sym3 = [v for vn, v in c.vars.items() if vn == 'sym3'][0]
 
@@ -215,3 +215,230 @@ def test_matrix_least_squares_constr():
     # Test for errors, not asserts, and for solution outcome (via ecos_solution)
 
     reset_symbols()
+
+def test_matrix_column_coefficients():
+    """ Stuffing merges repeated terms of a variable into one column """
+
+    v0 = Variable(name = 'v0')
+    v1 = Variable(name = 'v1')
+
+    p0 = Parameter(name = 'p0')
+
+    con = [le(v1 + 2*v1 + p0*v0, 1)]
+
+    p = Problem(Minimize(v0), con)
+    c = Canonicalize(p)
+
+    columns = c.column_coefficients(c.constraints[0].expr)
+
+    assert(list(columns.keys()) == [0, 1])
+    assert(str(columns[0]) == 'p0')
+    assert(str(columns[1]) == '3.0')
+
+    reset_symbols()
+
+def test_matrix_normalized_coefficients():
+    """ Coefficients are folded, like terms merged and zeros dropped """
+
+    v0 = Variable(name = 'v0')
+    v1 = Variable(name = 'v1')
+
+    p0 = Parameter(name = 'p0')
+    p1 = Parameter(name = 'p1')
+
+    con = [le(p0*v0 + 2*p1*v0 + p0*v0 + v1 - v1, 1)]
+
+    p = Problem(Minimize(v0), con)
+    c = Canonicalize(p)
+
+    columns = c.column_coefficients(c.constraints[0].expr)
+
+    assert(list(columns.keys()) == [0])  # v1 cancels, so takes no entry
+    assert(str(columns[0]) == '((2.0 * p0) + (2.0 * p1))')
+
+    reset_symbols()
+
+def test_matrix_eliminate_auxiliaries():
+    """ Auxiliaries defined by an equality are substituted out """
+
+    v0 = Variable(name = 'v0')
+
+    p0 = Parameter(name = 'p0')
+    p1 = Parameter(name = 'p1')
+
+    p = Problem(Minimize(square(p0*v0 - p1)), [le(v0, 1)])
+    c = Canonicalize(p)
+
+    # sym1 == p0*v0 - p1 goes, with the only row of A
+    assert(c.eliminated == {'variables' : 1, 'rows' : 1})
+    assert(list(c.vars) == ['v0', 'sym0'])
+    assert(c.A is None and c.b is None)
+
+    assert(c.G.shape == (4, 2))
+    assert([str(v) for v in c.G.A] == ['1.0', '(2.0 * p0)', '-1.0', '-1.0'])
+    assert([str(v) for v in c.h] == ['1.0', '1.0', '-1.0', '(2.0 * p1)'])
+    assert(c.dims == {'q': [3], 'l': 1})
+
+    reset_symbols()
+
+def test_matrix_generate_presolve(tmp_path):
+    """ Generate passes presolve on, and writes the rows it keeps """
+
+    from cvx_sym.generate import Generate
+    import contextlib
+    import io
+
+    for presolve, rows in [(True, 0), (False, 1)]:
+
+        v0 = Variable(name = 'v0')
+
+        p0 = Parameter(name = 'p0')
+        p1 = Parameter(name = 'p1')
+
+        p = Problem(Minimize(square(p0*v0 - p1)), [le(v0, 1)])
+
+        name = 'presolve_' + str(presolve)
+
+        # The solver is only copied into the project if missing
+        (tmp_path / name / 'ecos').mkdir(parents = True)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            gen = Generate(p, name = name, folder = tmp_path,
+                              presolve = presolve)
+
+        assert(gen.canonical.presolve == presolve)
+        assert(gen.canonical.eliminated['rows'] == 1 - rows)
+        assert(len(gen.canonical.b or []) == rows)
+
+        source = (tmp_path / name / 'problem.c').read_text()
+        assert(('Apr_init' in source) == (rows > 0))
+
+        reset_symbols()
+
+def test_matrix_generate_parameter_names(tmp_path):
+    """ Parameters named as the locals of problem.c still compile """
+
+    from cvx_sym.generate import Generate, cvx_sym_path
+    from cvx_sym.operations.functions.norms import norm
+    import contextlib
+    import subprocess
+    import shutil
+    import io
+
+    r = Variable((1,1), name = 'r')
+    x = Variable((2,1), name = 'x')
+
+    g     = Parameter((3,2), name = 'g')
+    value = Parameter((3,1), name = 'value')
+
+    # Each bounds r, and is aliased in the function of the norms of g
+    bounds = [Parameter(name = n) for n in ['t', 'k', 'f', 'prob', 'n']]
+
+    con  = [le(g[i,:].T * x + r * norm(g[i,:]), value[i]) for i in range(3)]
+    con += [le(r, p) for p in bounds]
+
+    p = Problem(Minimize(-1*r), con)
+
+    solver = cvx_sym_path / '__solvers__/ecos'
+
+    # The solver is only copied into the project if missing
+    (tmp_path / 'names').mkdir()
+    if solver.exists():
+        (tmp_path / 'names' / 'ecos').symlink_to(solver)
+    else:
+        (tmp_path / 'names' / 'ecos').mkdir()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        gen = Generate(p, name = 'names', folder = tmp_path)
+
+    assert(gen.context['local_names'] == {'prob' : 'prob_', 'n' : 'n_'})
+
+    reset_symbols()
+
+    if shutil.which('gcc') is None or not solver.exists():
+        return  # nothing to compile with
+
+    compiled = subprocess.run(['gcc', '-std=gnu99', '-fsyntax-only',
+                               '-Wall', '-Werror',
+                               '-Iecos/include',
+                               '-Iecos/external/SuiteSparse_config',
+                               'problem.c'], cwd = tmp_path / 'names',
+                               capture_output = True, text = True)
+
+    assert(compiled.returncode == 0), compiled.stderr
+
+def test_matrix_column_ordering():
+    """ Ordered columns keep their variables, so map back by name """
+
+    v0 = Variable(name = 'v0')
+    v1 = Variable(name = 'v1')
+    v2 = Variable(name = 'v2')
+
+    con = [le(v0 + v2, 1), le(v2 + v1, 2), le(v1, 3)]
+
+    p = Problem(Minimize(v0), con)
+    c = Canonicalize(p, ordering = 'rcm')
+
+    assert(c.permutation == [1, 2, 0])
+    assert(list(c.vars) == ['v1', 'v2', 'v0'])
+    assert(c.c == [0.0, 0.0, 1.0])
+    assert(c.bandwidth == (2, 1))
+
+    # G, in the new column order
+    dense = [[0.0] * 3 for i in range(3)]
+    for j in range(3):
+        for k in range(c.G.IA[j], c.G.IA[j+1]):
+            dense[c.G.JA[k]][j] = float(str(c.G.A[k]))
+
+    assert(dense == [[0.0, 1.0, 1.0],
+                     [1.0, 1.0, 0.0],
+                     [1.0, 0.0, 0.0]])
+
+    reset_symbols()
+
+def test_matrix_merge_rows():
+    """ Repeated rows are removed, keeping the tightest bounds """
+
+    v0 = Variable(name = 'v0')
+    v1 = Variable(name = 'v1')
+
+    p0 = Parameter(name = 'p0')
+
+    con = [le(v0, 2), le(2*v0, 2), le(v0, 3),    # v0 <= 1 is tightest
+           le(-1*v1, 0), le(-1*v1, 0),
+           le(v0 + v1, p0), le(v0 + v1, p0),
+           eq(v0 + v1, 1), eq(v0 + v1, 1)]
+
+    p = Problem(Minimize(v0), con)
+    c = Canonicalize(p)
+
+    assert(c.removed == {'A' : [1], 'G' : [0, 2, 4, 6]})
+    assert(c.dims == {'q': [], 'l': 3})
+
+    assert([str(h) for h in c.h] == ['2.0', '0.0', 'p0'])
+    assert([str(b) for b in c.b] == ['1.0'])
+
+    assert([str(v) for v in c.G.A] == ['2.0', '1.0', '-1.0', '1.0'])
+    assert(list(c.G.JA) == [0, 2, 1, 2])
+
+    reset_symbols()
+
+def test_matrix_merge_rows_parametric():
+    """ Rows on one variable with the same parametric h only repeat each
+        other with the same coefficient """
+
+    v0 = Variable(name = 'v0')
+    p0 = Parameter(name = 'p0')
+
+    con = [le(v0, p0), le(2*v0, p0), le(2*v0, p0)]
+
+    p = Problem(Minimize(-1*v0), con)
+    c = Canonicalize(p)
+
+    assert(c.removed == {'A' : [], 'G' : [2]})
+    assert(c.dims == {'q': [], 'l': 2})
+
+    assert([str(v) for v in c.G.A] == ['1.0', '2.0'])
+    assert([str(h) for h in c.h] == ['p0', 'p0'])
+
+    reset_symbols()
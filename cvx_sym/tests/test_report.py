@@ -0,0 +1,97 @@
+"""
+    Test the StageReport of Canonicalize:
+        Minimize(square(norm(F*x - g))) with x >= L ; F, g, L parameters
+"""
+
+from cvx_sym.symbolic import reset_symbols
+from cvx_sym.canonicalize import Canonicalize
+from cvx_sym.report import StageReport
+
+import cvx_sym as cvx
+
+import json
+import io
+
+def least_squares(**kwargs):
+
+    x = cvx.Variable ((3,1),name='x')
+    F = cvx.Parameter((3,3),name='F')
+    g = cvx.Parameter((3,1),name='g')
+    L = cvx.Parameter((3,1),name='L')
+
+    objective = cvx.Minimize(cvx.square(cvx.norm( F*x - g )))
+    problem   = cvx.Problem(objective, [ L <= x ])
+
+    return Canonicalize(problem, **kwargs)
+
+def test_report_stages():
+
+    canon = least_squares(report = True)
+
+    assert([s['stage'] for s in canon.report] == ['smith_form', 'relax_form',
+                'graph_form', 'expand', 'gather', 'stuff', 'presolve',
+                'sparse_form'])
+
+    for record in canon.report:
+        assert(record['seconds'] >= 0 and record['peak'] >= 0)
+
+    assert(canon.report.seconds > 0)
+
+    # Counts follow the problem through the stages
+    assert(canon.report['stuff']['counts']['variables'] == 11)
+    assert(canon.report['presolve']['counts']['variables'] == 5)
+    assert(canon.report['sparse_form']['counts'] == canon.counts())
+
+    reset_symbols()
+
+def test_report_json_lines():
+
+    lines  = io.StringIO()
+    report = StageReport(memory = False, jsonl = lines)
+
+    canon = least_squares(report = report)
+
+    assert(canon.report is report)
+    assert(lines.getvalue() == report.json_lines())
+
+    records = [json.loads(line) for line in lines.getvalue().splitlines()]
+
+    assert(records == report.stages)
+    assert(all(record['peak'] is None for record in records))
+
+    reset_symbols()
+
+def test_report_overlapping_stages():
+
+    import threading
+    import tracemalloc
+
+    a, b = StageReport(), StageReport()
+
+    began, ended = threading.Event(), threading.Event()
+
+    def stage_b():
+        with b.stage('b'):
+            began.set()
+            block = bytearray(1 << 20)
+            ended.wait()
+
+    with a.stage('a'):
+
+        thread = threading.Thread(target = stage_b)
+        thread.start()
+        began.wait()
+
+    # b ends after a, and tracing goes on until it does
+    assert(tracemalloc.is_tracing())
+    ended.set()
+    thread.join()
+
+    # Neither peak can be told apart from the other
+    assert(a['a']['peak'] is None and b['b']['peak'] is None)
+    assert(not tracemalloc.is_tracing())
+
+    with a.stage('alone'):
+        block = bytearray(1 << 20)
+
+    assert(a['alone']['peak'] >= 1 << 20)
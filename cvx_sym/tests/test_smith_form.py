@@ -210,3 +210,40 @@ def test_norm_inf():
         print('... SUCCESS!')
 
     reset_symbols()
+
+def test_smith_shared_subexpressions():
+    """ Repeated subtrees share one aux, and so one epigraph """
+
+    x = Variable((3,1),name='x')
+    g = Parameter((3,1),name='g')
+
+    objective = Minimize(square(norm(x - g)))
+    problem   = Problem(objective, [le(norm(x - g), 1),
+                                    le(norm(x, kind='inf'), 2),
+                                    le(norm(x, kind='inf'), 3)])
+
+    c = Canonicalize(problem, verbose=True, only='smith')
+
+    string_equals = [
+        """(sym2 + (-1.0 * x) + (g * 1.0)) == 0""",
+        """(sym1 + (-1.0 * norm2(sym2))) == 0""",
+        """(sym0 + (-1.0 * square(sym1))) == 0""",
+        """(sym1 + -1.0) <= 0""",
+
+        """(sym4[0][0] + (-1.0 * abs(x[0][0]))) == 0""",
+        """(sym4[1][0] + (-1.0 * abs(x[1][0]))) == 0""",
+        """(sym4[2][0] + (-1.0 * abs(x[2][0]))) == 0""",
+        """(sym3 + (-1.0 * max(sym4))) == 0""",
+
+        """(sym3 + -2.0) <= 0""",
+        """(sym3 + -3.0) <= 0""",
+    ]
+
+    assert(len(c.constraints) == len(string_equals))
+
+    for n, string in enumerate(string_equals):
+        print(c.constraints[n],' ???? ',string, end=' ')
+        assert(str(c.constraints[n]) == string)
+        print('... SUCCESS!')
+
+    reset_symbols()
@@ -0,0 +1,107 @@
+"""
+    Test building and canonicalizing independent problems in threads:
+        the control problem over horizons T, all with the same names
+"""
+
+from cvx_sym.symbolic import SymbolRegistry, reset_symbols
+from cvx_sym.canonicalize import Canonicalize
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import cvx_sym as cvx
+
+def control(T, n = 3, m = 2):
+
+    x = cvx.Variable((n, T+1), name='x')
+    u = cvx.Variable((m, T), name='u')
+
+    x_0 = cvx.Parameter((n), name='x_0')
+    A = cvx.Parameter((n,n), name='A')
+    B = cvx.Parameter((n,m), name='B')
+
+    states = []
+    constraints  = [ x[:,T] == 0 ]
+    constraints += [ x[:,0] == x_0[:,0] ]
+
+    for t in range(T):
+
+        constraints += [ x[:,t+1] == A*x[:,t] + B*u[:,t] ]
+        constraints += [ cvx.norm(u[:,t], kind = 'inf') <= 1 ]
+
+        states.append(cvx.sum_squares(x[:,t+1]) + cvx.sum_squares(u[:,t]))
+
+    return cvx.Problem(cvx.Minimize(cvx.sum(states)), constraints)
+
+def matrices(canon):
+    """ The canonical matrices, as strings, to compare between problems """
+
+    def entries(values):
+        return None if values is None else [str(v) for v in values]
+
+    def sparse(matrix):
+        if matrix is None:
+            return None
+        return (entries(matrix.A), list(matrix.JA), list(matrix.IA))
+
+    return {'c' : entries(canon.c), 'h' : entries(canon.h),
+            'b' : entries(canon.b), 'G' : sparse(canon.G),
+            'A' : sparse(canon.A), 'dims' : canon.dims}
+
+def build(T, own_registry):
+    """ Build and canonicalize control(T), in a registry of its own or in
+        the default registry of the thread, which is then reset """
+
+    if own_registry:
+        with SymbolRegistry():
+            problem = control(T)
+
+        canon = Canonicalize(problem)
+
+    else:
+        problem = control(T)
+        canon   = Canonicalize(problem)
+
+        reset_symbols()  # for the next problem on this thread
+
+    return canon, matrices(canon), threading.get_ident()
+
+def test_concurrent_canonicalize():
+
+    horizons = [2, 3, 4, 5, 6, 7]
+
+    # Built one after the other, as the reference
+    reference = {}
+    for T in horizons:
+        with SymbolRegistry():
+            reference[T] = Canonicalize(control(T))
+
+    tasks = [(horizons[k % len(horizons)], k % 2 == 0) for k in range(48)]
+
+    with ThreadPoolExecutor(max_workers = 8) as pool:
+        results = list(pool.map(lambda task: build(*task), tasks))
+
+    # The problems really did run on several threads
+    assert(len(set(thread for _, _, thread in results)) > 1)
+
+    seen = set()
+    for (T, own_registry), (canon, canonical, thread) in zip(tasks, results):
+
+        expected = reference[T]
+
+        # Exactly its own variables and parameters, by name
+        assert(list(canon.vars) == list(expected.vars))
+        assert(list(canon.parms) == list(expected.parms))
+        assert(list(canon.variables) == ['x', 'u'])
+
+        for s in list(canon.vars.values()) + list(canon.parms.values()):
+
+            assert(s.registry is canon.registry)
+            assert(id(s) not in seen)
+
+        seen.update(id(s) for s in list(canon.vars.values()) +
+                                   list(canon.parms.values()))
+
+        assert(canonical == matrices(expected))
+
+    reset_symbols()
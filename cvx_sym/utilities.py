@@ -95,6 +95,7 @@ def reshape_symbol(input, desired_shape):
             reshaped.matrix['row'] += [i]
             reshaped.matrix['col'] += [j]
 
+    reshaped.index_elements()
     reshaped.shape = desired_shape
     return reshaped
 